@@ -0,0 +1,87 @@
+"""Multi-process stress test for concurrent writers on one SQLite file.
+
+Every writer process runs read-modify-write increments of one shared
+counter task (stored in its description) through TaskManager.update_task,
+retrying when the compare-and-swap loses. Afterwards the counter must
+equal the number of successful updates; any difference is a lost update.
+
+    PYTHONPATH=src python benchmarks/concurrent_writers.py --writers 8 --updates 200
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+from task_manager.service import BusinessError, TaskManager
+from task_manager.storage import SQLiteStorage
+
+
+def _writer(db_path: str, task_id: str, updates: int, queue) -> None:
+    mgr = TaskManager(SQLiteStorage(db_path))
+    conflicts = 0
+    done = 0
+    while done < updates:
+        task = mgr.get_task(task_id)
+        try:
+            mgr.update_task(
+                task_id,
+                expected_version=task.version,
+                description=str(int(task.description) + 1),
+            )
+        except BusinessError:
+            conflicts += 1
+            continue
+        done += 1
+    queue.put((done, conflicts))
+
+
+def run(db_path: str, writers: int, updates: int) -> dict:
+    mgr = TaskManager(SQLiteStorage(db_path))
+    counter = mgr.create_task("counter", description="0")
+
+    queue: mp.Queue = mp.Queue()
+    procs = [
+        mp.Process(target=_writer, args=(db_path, counter.id, updates, queue))
+        for _ in range(writers)
+    ]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(done for done, _ in results)
+    conflicts = sum(c for _, c in results)
+    final = int(mgr.get_task(counter.id).description)
+    return {
+        "writers": writers,
+        "updates_per_writer": updates,
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(succeeded / elapsed, 1),
+        "succeeded": succeeded,
+        "conflicts_retried": conflicts,
+        "final_counter": final,
+        "lost_updates": succeeded - final,
+        "lost_update_rate": (succeeded - final) / succeeded if succeeded else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--db", default=None, help="database file (default: temp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "stress.db")
+        print(json.dumps(run(db_path, args.writers, args.updates), indent=2))
+
+
+if __name__ == "__main__":
+    main()
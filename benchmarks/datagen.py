@@ -0,0 +1,115 @@
+"""Seeded synthetic datasets for the benchmarks.
+
+The same (size, seed) always yields the same tasks, projects, tags and
+dependency chains, so runs on different commits measure the same data.
+"""
+from __future__ import annotations
+import random
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+from task_manager.models import Project, Task
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+TAGS = ["home", "work", "urgent", "errand", "backend", "frontend", "ops", "docs"]
+STATUSES = ["open", "open", "open", "in-progress", "done"]
+
+EPOCH = datetime(2024, 1, 1)
+
+
+def parse_size(value: str) -> int:
+    return SIZES[value.lower()] if value.lower() in SIZES else int(value)
+
+
+@dataclass
+class Dataset:
+    size: int
+    seed: int
+    projects: List[Project] = field(default_factory=list)
+    # ids of tasks that head a dependency chain, and every chained task
+    chain_heads: List[str] = field(default_factory=list)
+    chained: List[str] = field(default_factory=list)
+    sample_ids: List[str] = field(default_factory=list)
+
+
+def generate(size: int, seed: int = 42) -> Tuple[Dataset, Iterator[Task]]:
+    """Return the dataset summary and a lazy stream of its tasks.
+
+    Tasks are yielded one at a time so 1M rows never sit in memory at once;
+    the Dataset is filled in as the stream is consumed.
+    """
+    rng = random.Random(seed)
+    data = Dataset(size=size, seed=seed)
+    n_projects = max(1, size // 500)
+    data.projects = [
+        Project(id=str(uuid.UUID(int=rng.getrandbits(128))), name=f"project-{i}")
+        for i in range(n_projects)
+    ]
+
+    def tasks() -> Iterator[Task]:
+        previous = None
+        links = 0
+        sample_every = max(1, size // 1000)
+        for i in range(size):
+            task = Task(
+                id=str(uuid.UUID(int=rng.getrandbits(128))),
+                title=f"task {i}",
+                description="x" * rng.randint(0, 80),
+                created_at=EPOCH + timedelta(minutes=i),
+                due=(
+                    EPOCH + timedelta(days=rng.randint(0, 730))
+                    if rng.random() < 0.7
+                    else None
+                ),
+                priority=rng.randint(1, 5),
+                status=rng.choice(STATUSES),
+                tags=rng.sample(TAGS, rng.randint(0, 3)),
+            )
+            # every 20th task is part of a dependency chain of 10 links
+            if i % 20 == 0:
+                if previous is None:
+                    data.chain_heads.append(task.id)
+                    links = 1
+                else:
+                    task.deps = [previous.id]
+                    data.chained.append(task.id)
+                    links += 1
+                previous = task if links < 10 else None
+            data.projects[i % n_projects].task_ids.append(task.id)
+            if i % sample_every == 0:
+                data.sample_ids.append(task.id)
+            yield task
+
+    return data, tasks()
+
+
+def load(storage, size: int, seed: int = 42) -> Dataset:
+    """Generate a dataset straight into a repository or storage."""
+    data, tasks = generate(size, seed)
+    batch: List[Task] = []
+    for task in tasks:
+        batch.append(task)
+        if len(batch) == 10_000:
+            _save_all(storage, batch)
+            batch = []
+    _save_all(storage, batch)
+    with _transaction(storage):
+        for project in data.projects:
+            storage.save_project(project)
+    return data
+
+
+def _transaction(storage):
+    # InMemoryRepository has no transactions
+    transaction = getattr(storage, "transaction", None)
+    return transaction() if transaction else nullcontext()
+
+
+def _save_all(storage, tasks: List[Task]) -> None:
+    with _transaction(storage):
+        for task in tasks:
+            storage.save_task(task)
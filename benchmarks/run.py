@@ -0,0 +1,328 @@
+"""Benchmark suite with JSON baselines and regression thresholds.
+
+Loads a seeded dataset (see datagen.py) into each backend, then times
+repository, TaskManager and end-to-end CLI operations (CliRunner in
+process and `python -m task_manager.cli` subprocesses). Each case records
+latency percentiles and peak memory.
+
+    # record a baseline
+    PYTHONPATH=src python -m benchmarks.run --size 10k --output base.json
+    # after a change: fail if the fastest run or peak memory grew by more
+    # than 25%
+    PYTHONPATH=src python -m benchmarks.run --size 10k --baseline base.json
+
+Latency is gated on each case's fastest sample: scheduler and cache noise
+only ever adds time, so the minimum moves far less between identical runs
+than p50 does. Noise also comes in bursts lasting seconds, so the suite
+runs --runs times (default 3) and keeps each case's fastest pass.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from click.testing import CliRunner
+
+import task_manager
+from task_manager import cli
+from task_manager.repository import InMemoryRepository
+from task_manager.service import BusinessError, TaskManager
+from task_manager.sharding import ShardedStorage
+from task_manager.storage import SQLiteStorage
+
+from . import datagen
+
+BACKENDS = ("memory", "sqlite", "sharded")
+TOP_SORT = [("priority", False), ("due", False)]
+LIST_FIELDS = ("id", "title", "status", "due", "priority", "tags")
+
+# absolute slack so millisecond-level cases don't flap on noise
+MIN_DELTA_MS = 1.0
+GATED = ("min_ms", "peak_kib")
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    index = min(len(sorted_samples) - 1, round(pct / 100 * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+class Suite:
+    def __init__(self, repeat: int, only: Optional[str]) -> None:
+        self.repeat = repeat
+        self.only = only
+        self.results: Dict[str, dict] = {}
+
+    def measure(
+        self,
+        name: str,
+        fn: Callable[[], object],
+        repeat: Optional[int] = None,
+        memory: bool = True,
+    ) -> None:
+        """Time fn `repeat` times, then run it once more under tracemalloc."""
+        if self.only and self.only not in name:
+            return
+        samples = []
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        peak_kib = None
+        if memory:
+            tracemalloc.start()
+            fn()
+            peak_kib = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        self.record(name, samples, peak_kib)
+
+    def record(self, name: str, samples: List[float], peak_kib: Optional[int]):
+        ordered = sorted(s * 1000 for s in samples)
+        self.results[name] = {
+            "n": len(ordered),
+            "min_ms": round(ordered[0], 4),
+            "mean_ms": round(sum(ordered) / len(ordered), 4),
+            "p50_ms": round(_percentile(ordered, 50), 4),
+            "p95_ms": round(_percentile(ordered, 95), 4),
+            "p99_ms": round(_percentile(ordered, 99), 4),
+            "peak_kib": peak_kib,
+        }
+        print(
+            f"{name:<40} p50 {self.results[name]['p50_ms']:>10.3f}ms  "
+            f"p95 {self.results[name]['p95_ms']:>10.3f}ms  "
+            f"peak {peak_kib if peak_kib is not None else '-':>8} KiB",
+            file=sys.stderr,
+        )
+
+
+def _make_storage(backend: str, workdir: Path):
+    if backend == "memory":
+        return InMemoryRepository()
+    if backend == "sqlite":
+        return SQLiteStorage(workdir / "task_data.db")
+    return ShardedStorage(workdir / "shards", shards=4)
+
+
+def bench_backend(suite: Suite, backend: str, size: int, seed: int, workdir: Path):
+    storage = _make_storage(backend, workdir)
+    started = time.perf_counter()
+    data = datagen.load(storage, size, seed)
+    suite.record(f"{backend}.load", [time.perf_counter() - started], None)
+
+    mgr = TaskManager(storage)
+    rng = random.Random(seed)
+    ids = data.sample_ids
+
+    suite.measure(f"{backend}.get_task", lambda: storage.get_task(rng.choice(ids)))
+    suite.measure(f"{backend}.list_tasks", storage.list_tasks, repeat=3)
+    if hasattr(storage, "iter_tasks"):
+        suite.measure(
+            f"{backend}.top20",
+            lambda: list(storage.iter_tasks(LIST_FIELDS, sort=TOP_SORT, limit=20)),
+        )
+        suite.measure(
+            f"{backend}.filter_tag",
+            lambda: list(storage.iter_tasks(LIST_FIELDS, tag="urgent")),
+            repeat=3,
+        )
+    else:
+        suite.measure(f"{backend}.top20", lambda: mgr.list_tasks(TOP_SORT, 20))
+        suite.measure(
+            f"{backend}.filter_tag",
+            lambda: [t for t in storage.list_tasks() if "urgent" in t.tags],
+            repeat=3,
+        )
+
+    suite.measure(
+        f"manager.{backend}.create_task",
+        lambda: mgr.create_task("bench", tags=["bench"], priority=2),
+    )
+    suite.measure(
+        f"manager.{backend}.update_task",
+        lambda: mgr.update_task(rng.choice(ids), priority=rng.randint(1, 5)),
+    )
+    chained = iter(data.chained)
+
+    def complete_chained() -> None:
+        # most chained tasks are still blocked: exercises the dependency walk
+        try:
+            mgr.mark_complete(next(chained))
+        except BusinessError:
+            pass
+
+    suite.measure(
+        f"manager.{backend}.mark_complete",
+        complete_chained,
+        repeat=min(suite.repeat, max(1, len(data.chained) // 2 - 1)),
+    )
+    projects = [p.id for p in data.projects]
+    suite.measure(
+        f"manager.{backend}.project_stats",
+        lambda: mgr.project_stats(rng.choice(projects)),
+    )
+    doomed = iter(ids[len(ids) // 2 :])
+    suite.measure(
+        f"manager.{backend}.delete_task",
+        lambda: mgr.delete_task(next(doomed)),
+        repeat=min(5, len(ids) // 4),
+        memory=False,
+    )
+    return storage, data
+
+
+def bench_cli(suite: Suite, storage: SQLiteStorage, data, workdir: Path) -> None:
+    runner = CliRunner()
+    previous = cli.storage
+    cli.storage = storage
+    try:
+        suite.measure(
+            "cli.runner.list_tasks_top20",
+            lambda: runner.invoke(cli.cli, ["list-tasks", "--limit", "20"]),
+        )
+        suite.measure(
+            "cli.runner.show_task",
+            lambda: runner.invoke(cli.cli, ["show-task", data.sample_ids[0]]),
+        )
+        suite.measure(
+            "cli.runner.create_task",
+            lambda: runner.invoke(cli.cli, ["create-task", "--title", "cli bench"]),
+        )
+    finally:
+        cli.storage = previous
+
+    src = str(Path(task_manager.__file__).resolve().parent.parent)
+    env = dict(os.environ, PYTHONPATH=src, TASK_MANAGER_NO_DAEMON="1")
+    env.pop("TASK_MANAGER_SHARDS", None)
+
+    def run(*args: str) -> int:
+        """Run the CLI once and return that child's peak RSS in KiB."""
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "task_manager.cli", *args],
+            cwd=workdir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        # wait4 reports this child's own usage; RUSAGE_CHILDREN would be
+        # the largest of every child so far
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+        # ru_maxrss is KiB on Linux but bytes on macOS
+        return usage.ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+
+    # subprocess memory is the child's max RSS, not tracemalloc
+    for name, args in (
+        ("cli.subprocess.help", ("--help",)),
+        ("cli.subprocess.list_tasks_top20", ("list-tasks", "--limit", "20")),
+    ):
+        if suite.only and suite.only not in name:
+            continue
+        peaks: List[int] = []
+        suite.measure(
+            name,
+            lambda: peaks.append(run(*args)),
+            repeat=max(3, suite.repeat // 10),
+            memory=False,
+        )
+        suite.results[name]["peak_kib"] = max(peaks)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Return a message per case whose fastest run or peak memory regressed."""
+    if current["meta"]["size"] != baseline["meta"]["size"]:
+        raise SystemExit("baseline was recorded with a different --size")
+    regressions = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            continue
+        for metric in GATED:
+            before, after = base.get(metric), cur.get(metric)
+            if not before or after is None:
+                continue
+            if metric == "min_ms" and after - before < MIN_DELTA_MS:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append(
+                    f"{name} {metric}: {before} -> {after} "
+                    f"(+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Task manager benchmark suite")
+    parser.add_argument("--size", default="10k", help="10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=50, help="samples per case")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="passes over the suite; best one kept"
+    )
+    parser.add_argument(
+        "--backends", default=",".join(BACKENDS), help="comma-separated backends"
+    )
+    parser.add_argument("--only", default=None, help="run cases containing this")
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=None, help="compare to this JSON")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="allowed slowdown (0.25=25%%)"
+    )
+    args = parser.parse_args(argv)
+
+    size = datagen.parse_size(args.size)
+    backends = [b for b in args.backends.split(",") if b]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(sorted(unknown))}")
+
+    results: Dict[str, dict] = {}
+    for _ in range(args.runs):
+        suite = Suite(args.repeat, args.only)
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                storage, data = bench_backend(
+                    suite, backend, size, args.seed, Path(tmp)
+                )
+                if backend == "sqlite":
+                    bench_cli(suite, storage, data, Path(tmp))
+        for name, stats in suite.results.items():
+            if name not in results or stats["min_ms"] < results[name]["min_ms"]:
+                results[name] = stats
+
+    report = {
+        "meta": {
+            "size": size,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "runs": args.runs,
+            "python": platform.python_version(),
+            "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions beyond threshold", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Online full/incremental backups of a task database and verified restore.
+
+Full backups copy the live file with SQLite's online backup API a few
+pages per step, all inside one read transaction: with WAL enabled,
+writers carry on meanwhile and the copy is the snapshot taken at the
+start, so a busy database never forces the backup to start over.
+
+Incremental backups hold only the task and project rows whose change
+sequence (row_changes, kept by triggers in storage.py) moved past the
+previous backup's, plus tombstones for deleted rows. Every backup file is
+a SQLite database carrying a backup_meta table; a ".gz" destination (or
+compress=True) gzips it, with the same metadata as JSON in the gzip
+header's comment so it can be read without unpacking the database.
+
+restore() rebuilds a database from a full backup followed by its
+incrementals in order, checks the chain, integrity and row counts, and
+only then moves the result into place.
+"""
+from __future__ import annotations
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+import zlib
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Sequence
+
+from .storage import SQLiteStorage
+
+# pages copied per backup step, and the pause between steps (seconds)
+DEFAULT_PAGES = 1024
+DEFAULT_SLEEP = 0.005
+
+BACKED_UP_TABLES = ("tasks", "projects")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_GZIP_FLAGS = {"FEXTRA": 4, "FNAME": 8, "FCOMMENT": 16}
+_META_COMMENT = b"task_manager backup "
+
+
+class BackupError(Exception):
+    """Raised for unusable, mismatched or corrupt backups."""
+
+
+@dataclass
+class BackupInfo:
+    kind: str  # "full" or "incremental"
+    seq: int  # change sequence the backup is consistent with
+    base_seq: Optional[int]  # incrementals: seq of the backup they follow
+    tasks: int  # row counts of the whole database at that seq
+    projects: int
+
+
+def _snapshot_info(conn: sqlite3.Connection, kind: str, base_seq=None) -> BackupInfo:
+    seq = conn.execute("SELECT seq FROM change_counter WHERE id = 1").fetchone()[0]
+    tasks = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    projects = conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+    return BackupInfo(kind, seq, base_seq, tasks, projects)
+
+
+def _write_meta(conn: sqlite3.Connection, info: BackupInfo, schema: str = "main"):
+    conn.execute(f"DROP TABLE IF EXISTS {schema}.backup_meta")
+    conn.execute(f"CREATE TABLE {schema}.backup_meta (key TEXT PRIMARY KEY, value)")
+    conn.executemany(
+        f"INSERT INTO {schema}.backup_meta (key, value) VALUES (?, ?)",
+        list(vars(info).items()),
+    )
+
+
+def _read_meta(conn: sqlite3.Connection) -> BackupInfo:
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM backup_meta"))
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"not a task_manager backup ({e})") from e
+    return BackupInfo(**meta)
+
+
+@contextmanager
+def _opened(path: Path) -> Iterator[Path]:
+    """Yield a plain SQLite path for a backup file, gunzipping to a temp file."""
+    with open(path, "rb") as f:
+        compressed = f.read(2) == _GZIP_MAGIC
+    if not compressed:
+        yield Path(path)
+        return
+    fd, tmp = tempfile.mkstemp(suffix=".db")
+    try:
+        with os.fdopen(fd, "wb") as out, gzip.open(path, "rb") as src:
+            shutil.copyfileobj(src, out, 1 << 20)
+        yield Path(tmp)
+    finally:
+        os.unlink(tmp)
+
+
+def _read_cstring(f) -> bytes:
+    field = bytearray()
+    while (byte := f.read(1)) not in (b"", b"\0"):
+        field += byte
+    return bytes(field)
+
+
+def _gzip_comment(path: Path) -> Optional[bytes]:
+    """The comment field of a gzip file's header, if it has one."""
+    with open(path, "rb") as f:
+        header = f.read(10)
+        if len(header) < 10 or header[:2] != _GZIP_MAGIC:
+            return None
+        flags = header[3]
+        if flags & _GZIP_FLAGS["FEXTRA"]:
+            (size,) = struct.unpack("<H", f.read(2))
+            f.read(size)
+        if flags & _GZIP_FLAGS["FNAME"]:
+            _read_cstring(f)
+        return _read_cstring(f) if flags & _GZIP_FLAGS["FCOMMENT"] else None
+
+
+def read_info(path: Path) -> BackupInfo:
+    comment = _gzip_comment(path)
+    if comment is not None and comment.startswith(_META_COMMENT):
+        return BackupInfo(**json.loads(comment[len(_META_COMMENT) :]))
+    # plain backups, and gzipped ones written before the header comment
+    with _opened(path) as plain, closing(sqlite3.connect(plain)) as conn:
+        return _read_meta(conn)
+
+
+def _gzip_with_meta(src: Path, dest: Path, info: BackupInfo) -> None:
+    # gzip.open() can't write a header comment, so the container is
+    # written by hand around a raw deflate stream (RFC 1952)
+    comment = _META_COMMENT + json.dumps(vars(info)).encode("ascii")
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = size = 0
+    with open(src, "rb") as f, open(dest, "wb") as out:
+        out.write(_GZIP_MAGIC + bytes([8, _GZIP_FLAGS["FCOMMENT"]]))
+        out.write(struct.pack("<IBB", int(time.time()), 0, 255))
+        out.write(comment + b"\0")
+        while chunk := f.read(1 << 20):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            out.write(deflate.compress(chunk))
+        out.write(deflate.flush())
+        out.write(struct.pack("<II", crc, size & 0xFFFFFFFF))
+
+
+def _finish(tmp: Path, dest: Path, compress: bool, info: BackupInfo) -> None:
+    if compress:
+        packed = Path(f"{dest}.partial")
+        _gzip_with_meta(tmp, packed, info)
+        os.unlink(tmp)
+        tmp = packed
+    os.replace(tmp, dest)
+
+
+def backup(
+    db_path: Path,
+    dest: Path,
+    since: Optional[Path] = None,
+    compress: Optional[bool] = None,
+    pages: int = DEFAULT_PAGES,
+    sleep: float = DEFAULT_SLEEP,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> BackupInfo:
+    """Back up db_path to dest; incremental after the backup `since` if given.
+
+    compress defaults to dest ending in ".gz". progress(remaining, total)
+    is called after every step of a full backup.
+    """
+    dest = Path(dest)
+    if compress is None:
+        compress = dest.suffix == ".gz"
+    base = read_info(since) if since is not None else None
+    tmp = Path(f"{dest}.partial.db")
+    if tmp.exists():
+        tmp.unlink()
+    # autocommit mode so the read transaction below is ours to open and end
+    with closing(sqlite3.connect(db_path, isolation_level=None)) as src:
+        if base is not None:
+            src.execute("ATTACH DATABASE ? AS inc", (str(tmp),))
+        src.execute("BEGIN")
+        try:
+            info = _snapshot_info(
+                src, "incremental" if base else "full", base.seq if base else None
+            )
+            if base is not None and base.seq > info.seq:
+                raise BackupError(
+                    f"{since} is newer than the database (seq {base.seq} > "
+                    f"{info.seq}); is it a backup of another database?"
+                )
+            if base is None:
+                _copy_pages(src, tmp, info, pages, sleep, progress)
+            else:
+                _copy_changes(src, base.seq, info)
+            src.execute("COMMIT")
+        except BaseException:
+            src.execute("ROLLBACK")
+            if tmp.exists():
+                tmp.unlink()
+            raise
+    _finish(tmp, dest, compress, info)
+    return info
+
+
+def _copy_pages(src, tmp: Path, info: BackupInfo, pages, sleep, progress) -> None:
+    def step(status: int, remaining: int, total: int) -> None:
+        if progress is not None:
+            progress(remaining, total)
+
+    with closing(sqlite3.connect(tmp)) as dst:
+        src.backup(dst, pages=pages, progress=step, sleep=sleep)
+        _write_meta(dst, info)
+        dst.commit()
+        # a single self-contained file, no -wal sidecar
+        dst.execute("PRAGMA journal_mode=DELETE")
+
+
+def _copy_changes(src, base_seq: int, info: BackupInfo) -> None:
+    for table in BACKED_UP_TABLES:
+        src.execute(
+            f"""
+            CREATE TABLE inc.{table} AS
+            SELECT r.* FROM main.{table} r
+            JOIN main.row_changes c ON c.tbl = '{table}' AND c.row_id = r.id
+            WHERE c.seq > ?
+            """,
+            (base_seq,),
+        )
+    src.execute(
+        "CREATE TABLE inc.row_changes AS SELECT * FROM main.row_changes WHERE seq > ?",
+        (base_seq,),
+    )
+    _write_meta(src, info, schema="inc")
+
+
+def _apply_incremental(conn: sqlite3.Connection, path: Path, info: BackupInfo):
+    conn.execute("ATTACH DATABASE ? AS inc", (str(path),))
+    try:
+        conn.execute("BEGIN")
+        for table in BACKED_UP_TABLES:
+            columns = ", ".join(
+                row[1] for row in conn.execute(f"PRAGMA inc.table_info({table})")
+            )
+            conn.execute(
+                f"INSERT OR REPLACE INTO main.{table} ({columns}) "
+                f"SELECT {columns} FROM inc.{table}"
+            )
+            conn.execute(
+                f"""
+                DELETE FROM main.{table} WHERE id IN (
+                    SELECT row_id FROM inc.row_changes
+                    WHERE tbl = '{table}' AND deleted
+                )
+                """
+            )
+        # the triggers just logged these rows under local seqs; take the
+        # source's so later incrementals line up
+        conn.execute(
+            """
+            DELETE FROM main.row_changes
+            WHERE (tbl, row_id) IN (SELECT tbl, row_id FROM inc.row_changes)
+            """
+        )
+        conn.execute("INSERT INTO main.row_changes SELECT * FROM inc.row_changes")
+        conn.execute("UPDATE change_counter SET seq = ? WHERE id = 1", (info.seq,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("DETACH DATABASE inc")
+
+
+def _verify(conn: sqlite3.Connection, expected: BackupInfo) -> None:
+    problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    if problems != ["ok"]:
+        raise BackupError("integrity check failed: " + "; ".join(problems[:5]))
+    actual = _snapshot_info(conn, expected.kind, expected.base_seq)
+    if actual != expected:
+        raise BackupError(f"restored database does not match backup: {actual}")
+
+
+def restore(backups: Sequence[Path], target: Path, force: bool = False) -> BackupInfo:
+    """Rebuild target from a full backup plus incrementals, oldest first."""
+    if not backups:
+        raise BackupError("nothing to restore")
+    target = Path(target)
+    if target.exists() and not force:
+        raise BackupError(f"{target} exists; pass force=True to replace it")
+    tmp = Path(f"{target}.restoring")
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        with closing(sqlite3.connect(tmp, isolation_level=None)) as conn:
+            with _opened(backups[0]) as plain, closing(sqlite3.connect(plain)) as src:
+                info = _read_meta(src)
+                if info.kind != "full":
+                    raise BackupError(f"{backups[0]} is not a full backup")
+                src.backup(conn, pages=DEFAULT_PAGES, sleep=0)
+            conn.execute("DROP TABLE backup_meta")
+            for path in backups[1:]:
+                with _opened(path) as plain:
+                    step = read_info(plain)
+                    if step.kind != "incremental" or step.base_seq != info.seq:
+                        raise BackupError(
+                            f"{path} does not follow the previous backup "
+                            f"(expects seq {step.base_seq}, have {info.seq})"
+                        )
+                    _apply_incremental(conn, plain, step)
+                    info = step
+            _verify(conn, info)
+            conn.execute("PRAGMA journal_mode=DELETE")
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    # a stale WAL beside the new file would be replayed into it
+    for sidecar in ("-wal", "-shm"):
+        Path(f"{target}{sidecar}").unlink(missing_ok=True)
+    os.replace(tmp, target)
+    if len(backups) > 1:
+        # incrementals carry task rows only; derive the report rollup again
+        SQLiteStorage(target).rebuild_rollup()
+    return info
@@ -1,11 +1,31 @@
 from __future__ import annotations
 import click
 import json
-from datetime import datetime, date
-from typing import Optional, List
+import os
+import shlex
+import signal
+import sqlite3
+import sys
+import time
+from datetime import datetime, date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, List, Union
 from .models import Task, Project
-from .storage import SQLiteStorage
+from .storage import SQLiteStorage, TASK_FIELDS, PROJECT_FIELDS
+from .sharding import ShardedStorage
 from .service import TaskManager, BusinessError
+from .sorting import DEFAULT_SORT, SORT_KEYS, SortSpec, parse_sort
+from . import backup as backups, daemon, profiling, reporting
+from .formatting import (
+    DEFAULT_PROJECT_FIELDS,
+    DEFAULT_TASK_FIELDS,
+    FORMATS,
+    PROJECT_TABLE_CELLS,
+    REPORT_TABLE_CELLS,
+    TASK_TABLE_CELLS,
+    parse_fields,
+    write_rows,
+)
 
 from .commands import (
     UndoManager,
@@ -16,8 +36,23 @@ from .commands import (
 )
 
 
-# Default DB file in repo root (can be overridden in future)
-storage: SQLiteStorage = SQLiteStorage("task_data.db")
+def _default_storage() -> Union[SQLiteStorage, ShardedStorage]:
+    """task_data.db in the working directory, or shards when configured.
+
+    TASK_MANAGER_SHARDS=N spreads tasks over N files in task_data.shards/,
+    partitioned by TASK_MANAGER_SHARD_BY (hash, the default, or project).
+    """
+    shards = int(os.environ.get("TASK_MANAGER_SHARDS", "0") or 0)
+    if shards > 0:
+        return ShardedStorage(
+            Path("task_data.shards"),
+            shards=shards,
+            partition=os.environ.get("TASK_MANAGER_SHARD_BY", "hash"),
+        )
+    return SQLiteStorage("task_data.db")
+
+
+storage = _default_storage()
 
 undo_manager = UndoManager()
 
@@ -27,10 +62,50 @@ def get_manager() -> TaskManager:
     return TaskManager(storage)
 
 
+# ctx.meta key a command sets when it reports a failure (see _fail / run-batch)
+_FAILED_KEY = "task_manager.failed"
+
+
+def _fail(message: str) -> None:
+    """Echo an error message and flag the current command as failed."""
+    click.echo(message)
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None:
+        ctx.meta[_FAILED_KEY] = message
+
+
 @click.group()
-def cli() -> None:
+@click.option(
+    "--profile",
+    is_flag=True,
+    envvar="TASK_MANAGER_PROFILE",
+    help="Print per-layer timings and SQL statistics to stderr",
+)
+@click.option(
+    "--profile-out",
+    type=click.Path(dir_okay=False),
+    default=None,
+    envvar="TASK_MANAGER_PROFILE_OUT",
+    help="Write the profile to a file instead: .prof for cProfile, else JSON",
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, profile_out: Optional[str]) -> None:
     """Task Manager CLI"""
-    pass
+    global _started_at
+    # only this invocation's; a daemon started by main() must not report
+    # its uptime as parsing time for the requests it serves
+    started_at, _started_at = _started_at, None
+    if not (profile or profile_out) or ctx.resilient_parsing:
+        return
+    profiler = profiling.start(
+        cprofile=bool(profile_out and profile_out.endswith(".prof"))
+    )
+    if started_at is not None:
+        # main() ran before click parsed argv and dispatched here
+        profiler.add("click parsing", time.perf_counter() - started_at)
+    ctx.call_on_close(
+        lambda: profiling.stop(f"cli {ctx.invoked_subcommand}", profile_out)
+    )
 
 
 def _parse_due(due_str: Optional[str]) -> Optional[datetime]:
@@ -54,6 +129,12 @@ def _parse_due(due_str: Optional[str]) -> Optional[datetime]:
 @click.option("--priority", default=3, type=int, help="Priority 1 (high) .. 5 (low)")
 @click.option("--tag", "-t", multiple=True, help="Tag(s) for the task")
 @click.option("--project", default=None, help="Project name to add the task to")
+@click.option(
+    "--repeat",
+    default=None,
+    help="Recurrence starting at --due: daily, weekly, monthly, weekdays, "
+    "'every N days|weeks|months' or weekday lists like mon,thu",
+)
 def create_task(
     title: str,
     description: str,
@@ -61,6 +142,7 @@ def create_task(
     priority: int,
     tag: tuple,
     project: Optional[str],
+    repeat: Optional[str],
 ) -> None:
     due_dt = _parse_due(due)
     try:
@@ -83,6 +165,7 @@ def create_task(
             priority=priority,
             tags=list(tag),
             project=project,
+            recurrence=repeat,
         )
         undo_manager.execute(cmd)
 
@@ -90,7 +173,7 @@ def create_task(
 
 
     except Exception as e:
-        click.echo(f"Error: {e}")
+        _fail(f"Error: {e}")
 
 
 @cli.command("update-task")
@@ -101,6 +184,7 @@ def create_task(
 @click.option("--priority", default=None, type=int)
 @click.option("--status", default=None)
 @click.option("--tag", "tags", multiple=True)
+@click.option("--repeat", default=None, help="New recurrence rule for a series")
 def update_task(
     task_id: str,
     title: Optional[str],
@@ -109,8 +193,9 @@ def update_task(
     priority: Optional[int],
     status: Optional[str],
     tags: tuple,
+    repeat: Optional[str],
 ) -> None:
-    fields = {}
+    fields: Dict[str, Any] = {}
     if title is not None:
         fields["title"] = title
     if description is not None:
@@ -123,13 +208,24 @@ def update_task(
         fields["status"] = status
     if tags:
         fields["tags"] = list(tags)
+    if repeat is not None:
+        fields["recurrence"] = repeat
     try:
         t = get_manager().update_task(task_id, **fields)
         click.echo(f"Updated task {t.id} | {t.title}")
+    except ValueError as e:
+        _fail(f"Error: {e}")
     except BusinessError as e:
-        click.echo(f"Business error: {e}")
+        _fail(f"Business error: {e}")
     except Exception as e:
-        click.echo(f"Error: {e}")
+        _fail(f"Error: {e}")
+
+
+def _parse_sort_option(ctx, param, value) -> SortSpec:
+    try:
+        return parse_sort(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
 
 
 @cli.command("list-tasks")
@@ -138,7 +234,14 @@ def update_task(
 @click.option(
     "--due-before",
     default=None,
-    help="Show tasks due on or before this date (YYYY-MM-DD or ISO)",
+    help="Show tasks due on or before this date (YYYY-MM-DD or ISO); "
+    "recurring tasks are listed as their occurrences up to it",
+)
+@click.option(
+    "--due-after",
+    default=None,
+    help="Show tasks due on or after this date; occurrences of recurring "
+    "tasks start here (default today)",
 )
 @click.option(
     "--overdue",
@@ -146,53 +249,86 @@ def update_task(
     default=False,
     help="Show overdue tasks (due < today and not done)",
 )
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(FORMATS),
+    default="table",
+    show_default=True,
+    help="Output format",
+)
+@click.option(
+    "--fields",
+    default=None,
+    callback=parse_fields(TASK_FIELDS),
+    help=f"Comma-separated columns to output ({','.join(TASK_FIELDS)})",
+)
+@click.option(
+    "--sort",
+    "sort_specs",
+    multiple=True,
+    callback=_parse_sort_option,
+    help="Sort keys, e.g. 'priority,due:desc' "
+    f"({','.join(SORT_KEYS)}; default status,priority)",
+)
+@click.option(
+    "--limit",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Show at most this many tasks",
+)
 def list_tasks(
-    project: Optional[str], tag: Optional[str], due_before: Optional[str], overdue: bool
+    project: Optional[str],
+    tag: Optional[str],
+    due_before: Optional[str],
+    due_after: Optional[str],
+    overdue: bool,
+    fmt: str,
+    fields: Optional[tuple],
+    sort_specs: SortSpec,
+    limit: Optional[int],
 ) -> None:
-    # tasks = storage.list_tasks()
-    tasks = get_manager().list_tasks()
-
-    # project filter
+    project_id = None
     if project:
         p = storage.find_project_by_name(project)
         if not p:
-            click.echo(f"No project named '{project}'")
+            _fail(f"No project named '{project}'")
             return
-        tasks = [t for t in tasks if t.id in p.task_ids]
-    # tag filter
-    if tag:
-        tasks = [t for t in tasks if tag in t.tags]
-    # due-before filter
-    if due_before:
-        db_dt = _parse_due(due_before)
-        if db_dt:
-            tasks = [t for t in tasks if t.due and t.due <= db_dt]
-    # overdue filter
-    if overdue:
-        today = datetime.utcnow().date()
-        tasks = [
-            t for t in tasks if t.due and t.status != "done" and t.due.date() < today
-        ]
-
-    if not tasks:
+        project_id = p.id
+
+    fields = fields or DEFAULT_TASK_FIELDS
+    rows = storage.iter_tasks(
+        fields,
+        project_id=project_id,
+        tag=tag or None,
+        due_before=_parse_due(due_before),
+        overdue_on=datetime.utcnow() if overdue else None,
+        sort=sort_specs or DEFAULT_SORT,
+        limit=limit,
+        due_after=_parse_due(due_after),
+    )
+    written = write_rows(rows, fields, fmt, TASK_TABLE_CELLS)
+    if not written and fmt == "table":
         click.echo("No tasks.")
-        return
-
-    for t in sorted(tasks, key=lambda x: (x.status, x.priority)):
-        due_str = t.due.isoformat() if t.due else "—"
-        click.echo(
-            f"{t.id[:8]} | {t.title} | {t.status} | due:{due_str} | prio:{t.priority} | tags:{','.join(t.tags)}"
-        )
 
 
 @cli.command("show-task")
 @click.argument("task_id")
-def show_task(task_id: str) -> None:
-    t = storage.get_task(task_id)
-    if not t:
-        click.echo(f"Task {task_id} not found")
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["json", "jsonl"]),
+    default="json",
+    show_default=True,
+    help="Pretty JSON, or a single compact line",
+)
+def show_task(task_id: str, fmt: str) -> None:
+    try:
+        t = get_manager().get_task(task_id)
+    except BusinessError:
+        _fail(f"Task {task_id} not found")
         return
-    click.echo(json.dumps(t.to_dict(), indent=2))
+    click.echo(json.dumps(t.to_dict(), indent=2 if fmt == "json" else None))
 
 
 @cli.command("complete-task")
@@ -202,7 +338,7 @@ def complete_task(task_id: str) -> None:
         _ = get_manager().mark_complete(task_id)
         click.echo(f"Marked {task_id} as done")
     except BusinessError as e:
-        click.echo(f"Cannot complete task: {e}")
+        _fail(f"Cannot complete task: {e}")
 
 
 @cli.command("delete-task")
@@ -212,7 +348,7 @@ def delete_task(task_id: str) -> None:
         get_manager().delete_task(task_id)
         click.echo(f"Deleted task {task_id}")
     except BusinessError as e:
-        click.echo(f"Cannot delete task: {e}")
+        _fail(f"Cannot delete task: {e}")
 
 
 @cli.command("create-project")
@@ -220,7 +356,7 @@ def delete_task(task_id: str) -> None:
 def create_project(name: str) -> None:
     existing = storage.find_project_by_name(name)
     if existing:
-        click.echo(f"Project '{name}' already exists (id={existing.id})")
+        _fail(f"Project '{name}' already exists (id={existing.id})")
         return
     p = Project(name=name)
     storage.save_project(p)
@@ -228,9 +364,90 @@ def create_project(name: str) -> None:
 
 
 @cli.command("list-projects")
-def list_projects() -> None:
-    for p in storage.list_projects():
-        click.echo(f"{p.id[:8]} | {p.name} | tasks:{len(p.task_ids)}")
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(FORMATS),
+    default="table",
+    show_default=True,
+    help="Output format",
+)
+@click.option(
+    "--fields",
+    default=None,
+    callback=parse_fields(PROJECT_FIELDS),
+    help=f"Comma-separated columns to output ({','.join(PROJECT_FIELDS)})",
+)
+def list_projects(fmt: str, fields: Optional[tuple]) -> None:
+    fields = fields or DEFAULT_PROJECT_FIELDS
+    write_rows(storage.iter_projects(fields), fields, fmt, PROJECT_TABLE_CELLS)
+
+
+@cli.command("report")
+@click.argument("kind", type=click.Choice(["burndown", "throughput", "lead-time"]))
+@click.option(
+    "--since", default=None, help="First day (YYYY-MM-DD; default 30 days ago)"
+)
+@click.option("--until", default=None, help="Last day (YYYY-MM-DD; default today)")
+@click.option("--project", default=None, help="Only tasks in this project")
+@click.option("--tag", default=None, help="Only tasks with this tag")
+@click.option("--status", default=None, help="Only tasks currently in this status")
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(FORMATS),
+    default="table",
+    show_default=True,
+    help="Output format",
+)
+def report(
+    kind: str,
+    since: Optional[str],
+    until: Optional[str],
+    project: Optional[str],
+    tag: Optional[str],
+    status: Optional[str],
+    fmt: str,
+) -> None:
+    """Burndown, throughput or lead-time from the daily rollup."""
+    if sum(x is not None for x in (project, tag, status)) > 1:
+        _fail("Use at most one of --project, --tag and --status")
+        return
+    dimension, key = "all", ""
+    if project is not None:
+        p = storage.find_project_by_name(project)
+        if not p:
+            _fail(f"No project named '{project}'")
+            return
+        dimension, key = "project", p.id
+    elif tag is not None:
+        dimension, key = "tag", tag
+    elif status is not None:
+        dimension, key = "status", status
+
+    try:
+        end = date.fromisoformat(until) if until else datetime.utcnow().date()
+        start = date.fromisoformat(since) if since else end - timedelta(days=29)
+    except ValueError as e:
+        _fail(f"Invalid date: {e}")
+        return
+    if start > end:
+        _fail("--since must not be after --until")
+        return
+
+    if kind == "lead-time":
+        rows = [reporting.lead_time(storage.rollup_totals(dimension, key, start, end))]
+    else:
+        series = storage.rollup_rows(dimension, key, start, end)
+        if kind == "throughput":
+            rows = reporting.throughput(series, start, end)
+        else:
+            before = storage.rollup_totals(
+                dimension, key, until=start - timedelta(days=1)
+            )
+            rows = reporting.burndown(series, before, start, end)
+    write_rows(rows, list(rows[0]), fmt, REPORT_TABLE_CELLS)
+
 
 @cli.command("undo")
 def undo() -> None:
@@ -238,7 +455,7 @@ def undo() -> None:
         undo_manager.undo()
         click.echo("Last action undone")
     except BusinessError as e:
-        click.echo(str(e))
+        _fail(str(e))
 
 @cli.command("redo")
 def redo() -> None:
@@ -246,8 +463,232 @@ def redo() -> None:
         undo_manager.redo()
         click.echo("Last action redone")
     except BusinessError as e:
-        click.echo(str(e))
+        _fail(str(e))
 
 
-if __name__ == "__main__":
+class _BatchAborted(Exception):
+    """Raised inside a batch transaction to roll it back (--stop-on-error)."""
+
+
+def _run_line(ctx: click.Context, line: str) -> Optional[str]:
+    """Run one script line as a CLI command; return its error message, if any."""
+    try:
+        args = shlex.split(line, comments=True)
+    except ValueError as e:
+        return f"Parse error: {e}"
+    if not args:
+        return None
+    name = args[0]
+    command = cli.get_command(ctx, name)
+    if command is None or name == "run-batch":
+        return f"Unknown command '{name}'"
+    ctx.meta.pop(_FAILED_KEY, None)
+    try:
+        with command.make_context(name, args[1:], parent=ctx) as sub_ctx:
+            command.invoke(sub_ctx)
+    except click.exceptions.Exit as e:
+        return None if e.exit_code == 0 else f"Exited with code {e.exit_code}"
+    except click.ClickException as e:
+        return e.format_message()
+    except Exception as e:
+        return f"Error: {e}"
+    return ctx.meta.pop(_FAILED_KEY, None)
+
+
+@cli.command("run-batch")
+@click.argument("script", type=click.File("r"))
+@click.option(
+    "--batch-size",
+    default=500,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of commands committed per transaction",
+)
+@click.option(
+    "--continue-on-error/--stop-on-error",
+    default=False,
+    help="Keep going after a failing line, or (default) roll back its batch and stop",
+)
+@click.pass_context
+def run_batch(
+    ctx: click.Context, script, batch_size: int, continue_on_error: bool
+) -> None:
+    """Run CLI command lines from SCRIPT (or - for stdin) in one process."""
+    started = time.perf_counter()
+    executed = 0
+    failures: List[str] = []
+    batches = 0
+    slowest = 0.0
+    command_time = 0.0
+    aborted = False
+
+    lines = (
+        (lineno, line)
+        for lineno, line in enumerate(script, start=1)
+        if line.strip() and not line.lstrip().startswith("#")
+    )
+    while not aborted:
+        batch = [item for _, item in zip(range(batch_size), lines)]
+        if not batch:
+            break
+        try:
+            with storage.transaction():
+                for lineno, line in batch:
+                    t0 = time.perf_counter()
+                    error = _run_line(ctx, line)
+                    took = time.perf_counter() - t0
+                    command_time += took
+                    slowest = max(slowest, took)
+                    executed += 1
+                    if error is None:
+                        continue
+                    failures.append(f"line {lineno}: {error}")
+                    if not continue_on_error:
+                        raise _BatchAborted()
+            batches += 1
+        except _BatchAborted:
+            aborted = True
+
+    elapsed = time.perf_counter() - started
+    rate = executed / elapsed if elapsed > 0 else 0.0
+    avg_ms = command_time / executed * 1000 if executed else 0.0
+    for failure in failures:
+        click.echo(failure, err=True)
+    if aborted:
+        click.echo("Stopped on error; last batch rolled back", err=True)
+    click.echo(
+        f"Batch: {executed} commands, {len(failures)} failed, "
+        f"{batches} batches committed | {elapsed:.2f}s total | {rate:.1f} cmd/s | "
+        f"avg {avg_ms:.2f}ms | max {slowest * 1000:.2f}ms"
+    )
+    if failures:
+        ctx.exit(1)
+
+
+def _database_path() -> Optional[Path]:
+    if isinstance(storage, SQLiteStorage):
+        return Path(storage.db_path)
+    _fail("backup and restore work on a single database, not sharded storage")
+    return None
+
+
+@cli.command("backup")
+@click.argument("dest", type=click.Path(dir_okay=False))
+@click.option(
+    "--incremental-from",
+    "since",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Only save changes made after this earlier backup",
+)
+@click.option(
+    "--compress/--no-compress",
+    default=None,
+    help="gzip the backup (default: when DEST ends in .gz)",
+)
+@click.option(
+    "--pages",
+    default=backups.DEFAULT_PAGES,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Database pages copied per step of a full backup",
+)
+def backup(
+    dest: str, since: Optional[str], compress: Optional[bool], pages: int
+) -> None:
+    """Back up the database while it stays in use."""
+    db_path = _database_path()
+    if db_path is None:
+        return
+    try:
+        info = backups.backup(
+            db_path,
+            Path(dest),
+            Path(since) if since else None,
+            compress,
+            pages=pages,
+        )
+    except (backups.BackupError, sqlite3.Error) as e:
+        _fail(f"Backup failed: {e}")
+        return
+    click.echo(
+        f"{info.kind.capitalize()} backup to {dest} at change {info.seq} "
+        f"({info.tasks} tasks, {info.projects} projects)"
+    )
+
+
+@cli.command("restore")
+@click.argument("backup_files", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "--to",
+    "target",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Database to create (default: the configured database)",
+)
+@click.option("--force", is_flag=True, help="Replace the target if it exists")
+def restore(backup_files: tuple, target: Optional[str], force: bool) -> None:
+    """Rebuild a database from a full backup and its incrementals, in order."""
+    if target is None:
+        db_path = _database_path()
+        if db_path is None:
+            return
+        target = str(db_path)
+    try:
+        info = backups.restore([Path(p) for p in backup_files], Path(target), force)
+    except (backups.BackupError, sqlite3.Error) as e:
+        _fail(f"Restore failed: {e}")
+        return
+    click.echo(
+        f"Restored {target} at change {info.seq} "
+        f"({info.tasks} tasks, {info.projects} projects, verified)"
+    )
+
+
+@cli.command("serve")
+@click.option(
+    "--socket",
+    "socket_path",
+    default=None,
+    help="Unix socket path (default: $TASK_MANAGER_SOCKET or task_manager.sock)",
+)
+def serve(socket_path: Optional[str]) -> None:
+    """Keep a task-manager process running for other CLI invocations."""
+    path = socket_path or daemon.default_socket_path()
+    try:
+        server = daemon.TaskDaemon(path, cli)
+    except OSError as e:
+        raise click.ClickException(f"Cannot listen on {path}: {e}")
+    click.echo(f"Serving on {path} (Ctrl+C to stop)")
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# set by main() so --profile can report time spent before dispatch;
+# consumed by the first cli() callback
+_started_at: Optional[float] = None
+
+
+def main() -> None:
+    """Entry point: forward to a running `serve` daemon, else run in-process."""
+    global _started_at
+    _started_at = time.perf_counter()
+    argv = sys.argv[1:]
+    if not os.environ.get("TASK_MANAGER_NO_DAEMON"):
+        code = daemon.forward(argv)
+        if code is not None:
+            sys.exit(code)
     cli()
+
+
+if __name__ == "__main__":
+    main()
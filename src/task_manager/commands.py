@@ -61,6 +61,7 @@ class CreateTaskCommand(Command):
         priority: int = 3,
         tags=None,
         project: Optional[str] = None,
+        recurrence: Optional[str] = None,
     ):
         self.manager = manager
         self.title = title
@@ -69,6 +70,7 @@ class CreateTaskCommand(Command):
         self.priority = priority
         self.tags = tags or []
         self.project = project
+        self.recurrence = recurrence
         self.task_id: Optional[str] = None
 
     def execute(self) -> None:
@@ -79,6 +81,7 @@ class CreateTaskCommand(Command):
             priority=self.priority,
             tags=self.tags,
             project_name=self.project,
+            recurrence=self.recurrence,
         )
         self.task_id = task.id
 
@@ -98,12 +101,12 @@ class UpdateTaskCommand(Command):
     def execute(self) -> None:
         task = self.manager.get_task(self.task_id)
         self.old_title = task.title
-        self.manager.update_task(self.task_id, self.new_title)
+        self.manager.update_task(self.task_id, title=self.new_title)
 
     def undo(self) -> None:
         if self.old_title is None:
             raise BusinessError("No update to undo")
-        self.manager.update_task(self.task_id, self.old_title)
+        self.manager.update_task(self.task_id, title=self.old_title)
 class CompleteTaskCommand(Command):
     def __init__(self, manager: TaskManager, task_id: str):
         self.manager = manager
@@ -0,0 +1,206 @@
+"""Long-lived task-manager process and the thin client that forwards to it.
+
+Protocol: one JSON object per line over a Unix domain socket.
+
+    request:  {"argv": ["list-tasks", "--tag", "home"]}
+    response: {"stdout": "...", "stderr": "...", "exit_code": 0}
+
+A request without "argv" is a ping and gets {"ok": true}.
+"""
+from __future__ import annotations
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import click
+
+DEFAULT_SOCKET = "task_manager.sock"
+
+# commands that never write; the daemon runs these concurrently; everything
+# else goes through the single writer lock
+READ_COMMANDS = {"list-tasks", "list-projects", "show-task", "report"}
+
+# commands the client always runs in its own process (serve itself, and
+# run-batch, backup and restore because their paths belong to the client)
+LOCAL_COMMANDS = {"serve", "run-batch", "backup", "restore"}
+
+# profiled runs stay local: inside the daemon a profile would count other
+# clients' requests, and --profile-out writes a file on the client's side
+LOCAL_OPTIONS = ("--profile",)  # also matches --profile-out
+LOCAL_ENV = ("TASK_MANAGER_PROFILE", "TASK_MANAGER_PROFILE_OUT")
+
+
+def default_socket_path() -> str:
+    return os.environ.get("TASK_MANAGER_SOCKET", DEFAULT_SOCKET)
+
+
+class _ThreadLocalStream:
+    """sys.stdout/sys.stderr stand-in that routes writes per thread.
+
+    Threads inside capture() write into their own buffer; everyone else
+    writes to the wrapped stream.
+    """
+
+    encoding = "utf-8"
+    errors = "strict"
+
+    def __init__(self, fallback) -> None:
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def _target(self):
+        buffer = getattr(self._local, "buffer", None)
+        return buffer if buffer is not None else self._fallback
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        target = self._target()
+        return target is self._fallback and target.isatty()
+
+    @contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        self._local.buffer = io.StringIO()
+        try:
+            yield self._local.buffer
+        finally:
+            self._local.buffer = None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "TaskDaemon"
+
+    def handle(self) -> None:
+        for raw in self.rfile:
+            try:
+                request = json.loads(raw)
+            except ValueError:
+                response = {"stdout": "", "stderr": "Bad request\n", "exit_code": 2}
+            else:
+                if "argv" in request:
+                    response = self.server.run(list(request["argv"]))
+                else:
+                    response = {"ok": True}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class TaskDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Runs CLI commands for clients inside one process.
+
+    The process keeps the imported CLI, its storage and the undo history, so
+    `undo`/`redo` work across client invocations. Read commands run in
+    parallel on their own threads; writes are serialized by one lock.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, cli: click.Group) -> None:
+        self.socket_path = socket_path
+        self.cli = cli
+        self._write_lock = threading.Lock()
+        self._stream_lock = threading.Lock()
+        if os.path.exists(socket_path) and _ping(socket_path) is None:
+            # stale socket left by a daemon that died
+            os.unlink(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        with self._stream_lock:
+            if isinstance(sys.stdout, _ThreadLocalStream):
+                sys.stdout = sys.stdout._fallback
+            if isinstance(sys.stderr, _ThreadLocalStream):
+                sys.stderr = sys.stderr._fallback
+
+    def _streams(self) -> Tuple[_ThreadLocalStream, _ThreadLocalStream]:
+        # installed lazily (and re-installed if something swapped sys.stdout)
+        # so output of concurrent requests never interleaves
+        with self._stream_lock:
+            if not isinstance(sys.stdout, _ThreadLocalStream):
+                sys.stdout = _ThreadLocalStream(sys.stdout)  # type: ignore
+            if not isinstance(sys.stderr, _ThreadLocalStream):
+                sys.stderr = _ThreadLocalStream(sys.stderr)  # type: ignore
+            return sys.stdout, sys.stderr  # type: ignore[return-value]
+
+    def run(self, argv: List[str]) -> dict:
+        if argv and argv[0] in LOCAL_COMMANDS:
+            return {
+                "stdout": "",
+                "stderr": f"'{argv[0]}' cannot run inside the daemon\n",
+                "exit_code": 2,
+            }
+        if argv and argv[0] in READ_COMMANDS:
+            code, out, err = self._invoke(argv)
+        else:
+            with self._write_lock:
+                code, out, err = self._invoke(argv)
+        return {"stdout": out, "stderr": err, "exit_code": code}
+
+    def _invoke(self, argv: List[str]) -> Tuple[int, str, str]:
+        stdout, stderr = self._streams()
+        with stdout.capture() as out, stderr.capture() as err:
+            try:
+                rv = self.cli.main(
+                    args=argv, prog_name="task-manager", standalone_mode=False
+                )
+                code = rv if isinstance(rv, int) else 0
+            except click.ClickException as e:
+                e.show()
+                code = e.exit_code
+            except click.Abort:
+                code = 1
+            except Exception as e:
+                click.echo(f"Error: {e}", err=True)
+                code = 1
+            return code, out.getvalue(), err.getvalue()
+
+
+def _request(socket_path: str, payload: dict) -> Optional[dict]:
+    """Send one request; None when no daemon is listening on socket_path."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    return json.loads(line) if line else None
+
+
+def _ping(socket_path: str) -> Optional[dict]:
+    return _request(socket_path, {})
+
+
+def forward(argv: List[str], socket_path: Optional[str] = None) -> Optional[int]:
+    """Run argv on a running daemon and echo its output.
+
+    Returns the command's exit code, or None if it has to run locally (no
+    daemon, or a command that only makes sense in the client process).
+    """
+    # a false positive (e.g. a task titled "serve") just runs locally
+    if (
+        LOCAL_COMMANDS.intersection(argv)
+        or any(arg.startswith(LOCAL_OPTIONS) for arg in argv)
+        or any(os.environ.get(name) for name in LOCAL_ENV)
+    ):
+        return None
+    response = _request(socket_path or default_socket_path(), {"argv": argv})
+    if response is None:
+        return None
+    click.echo(response.get("stdout", ""), nl=False)
+    click.echo(response.get("stderr", ""), nl=False, err=True)
+    return int(response.get("exit_code", 0))
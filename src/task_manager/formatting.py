@@ -0,0 +1,126 @@
+"""Streaming row writers behind the --format/--fields options."""
+from __future__ import annotations
+import csv
+import json
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+import click
+
+from .recurrence import OCCURRENCE_SEP, split_occurrence_id
+
+FORMATS = ("table", "jsonl", "csv", "tsv")
+
+DEFAULT_TASK_FIELDS = ("id", "title", "status", "due", "priority", "tags")
+DEFAULT_PROJECT_FIELDS = ("id", "name", "tasks")
+
+
+def _short_task_id(task_id: str) -> str:
+    # an occurrence keeps its @YYYY-MM-DD, or a series' rows look identical
+    occurrence = split_occurrence_id(task_id)
+    if occurrence is None:
+        return task_id[:8]
+    return f"{occurrence[0][:8]}{OCCURRENCE_SEP}{occurrence[1].isoformat()}"
+
+
+def _lead_hours(v: Any) -> str:
+    if v is None:
+        return "—"
+    # the overflow bucket comes as a string such as ">8760"
+    return f"{v}h" if isinstance(v, str) else f"<={v:g}h"
+
+
+# how each field is rendered as a "table" cell
+TASK_TABLE_CELLS: Dict[str, Callable[[Any], str]] = {
+    "id": _short_task_id,
+    "title": str,
+    "description": str,
+    "status": str,
+    "due": lambda v: f"due:{v or '—'}",
+    "priority": lambda v: f"prio:{v}",
+    "tags": lambda v: f"tags:{','.join(v)}",
+    "project": lambda v: f"project:{v or '—'}",
+    "created": lambda v: f"created:{v or '—'}",
+}
+
+PROJECT_TABLE_CELLS: Dict[str, Callable[[Any], str]] = {
+    "id": lambda v: v[:8],
+    "name": str,
+    "tasks": lambda v: f"tasks:{v}",
+}
+
+REPORT_TABLE_CELLS: Dict[str, Callable[[Any], str]] = {
+    "day": str,
+    "created": lambda v: f"created:{v}",
+    "completed": lambda v: f"completed:{v}",
+    "open": lambda v: f"open:{v}",
+    "p50_hours": lambda v: f"p50:{_lead_hours(v)}",
+    "p90_hours": lambda v: f"p90:{_lead_hours(v)}",
+    "p99_hours": lambda v: f"p99:{_lead_hours(v)}",
+}
+
+
+def parse_fields(allowed: Iterable[str]):
+    """Build a click callback turning "a,b,c" into a validated tuple."""
+    allowed = tuple(allowed)
+
+    def callback(ctx, param, value):
+        if value is None:
+            return None
+        fields = tuple(f.strip() for f in value.split(",") if f.strip())
+        unknown = [f for f in fields if f not in allowed]
+        if unknown or not fields:
+            raise click.BadParameter(
+                f"unknown field(s) {', '.join(unknown) or '(none)'}; "
+                f"choose from {', '.join(allowed)}"
+            )
+        return fields
+
+    return callback
+
+
+class _BufferedEcho:
+    """File-like sink that hands stdout large chunks instead of single rows."""
+
+    def __init__(self, flush_every: int = 512) -> None:
+        self._parts: List[str] = []
+        self._flush_every = flush_every
+
+    def write(self, s: str) -> None:
+        self._parts.append(s)
+        if len(self._parts) >= self._flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._parts:
+            click.echo("".join(self._parts), nl=False)
+            self._parts.clear()
+
+
+def _plain(value: Any) -> Any:
+    return ",".join(value) if isinstance(value, list) else value
+
+
+def write_rows(
+    rows: Iterable[Dict[str, Any]],
+    fields: Sequence[str],
+    fmt: str,
+    table_cells: Dict[str, Callable[[Any], str]],
+) -> int:
+    """Write rows to stdout as they arrive; return how many were written."""
+    out = _BufferedEcho()
+    count = 0
+    if fmt in ("csv", "tsv"):
+        writer = csv.writer(
+            out, delimiter="," if fmt == "csv" else "\t", lineterminator="\n"
+        )
+        writer.writerow(fields)
+        for count, row in enumerate(rows, start=1):
+            writer.writerow([_plain(row[f]) for f in fields])
+    elif fmt == "jsonl":
+        for count, row in enumerate(rows, start=1):
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    else:
+        for count, row in enumerate(rows, start=1):
+            out.write(" | ".join(table_cells[f](row[f]) for f in fields) + "\n")
+    out.flush()
+    return count
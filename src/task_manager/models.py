@@ -4,6 +4,8 @@ from datetime import datetime
 from typing import List, Optional
 import uuid
 
+from .recurrence import parse_rule
+
 VALID_STATUSES = {"open", "in-progress", "done"}
 
 
@@ -18,9 +20,20 @@ class Task:
     status: str = "open"
     tags: List[str] = field(default_factory=list)
     deps: List[str] = field(default_factory=list)
+    # bumped on every save; storage only accepts a save if it still matches
+    version: int = 0
+    completed_at: Optional[datetime] = None
+    # a recurring task is a template whose occurrences are expanded lazily;
+    # a materialized occurrence points back at it through `series`
+    recurrence: Optional[str] = None
+    series: Optional[str] = None
+    # a template's occurrences deleted from the series, as YYYY-MM-DD
+    skipped: List[str] = field(default_factory=list)
 
     def mark_done(self):
         self.status = "done"
+        if self.completed_at is None:
+            self.completed_at = datetime.utcnow()
 
     # ✅ REQUIRED by SQLiteStorage
     @property
@@ -35,6 +48,7 @@ class Task:
         d = asdict(self)
         d["created_at"] = self.created_at.isoformat()
         d["due"] = self.due.isoformat() if self.due else None
+        d["completed_at"] = self.completed_at.isoformat() if self.completed_at else None
         return d
 
     @classmethod
@@ -42,6 +56,8 @@ class Task:
         dd = dict(d)
         dd["created_at"] = datetime.fromisoformat(dd["created_at"])
         dd["due"] = datetime.fromisoformat(dd["due"]) if dd.get("due") else None
+        if dd.get("completed_at"):
+            dd["completed_at"] = datetime.fromisoformat(dd["completed_at"])
         return cls(**dd)
 
     def validate(self) -> None:
@@ -51,6 +67,10 @@ class Task:
             raise ValueError("priority must be between 1 and 5")
         if self.status not in VALID_STATUSES:
             raise ValueError(f"status must be one of {VALID_STATUSES}")
+        if self.recurrence is not None:
+            parse_rule(self.recurrence)
+            if self.due is None:
+                raise ValueError("a recurring task needs a due date to start from")
 
 
 @dataclass
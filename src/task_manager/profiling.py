@@ -0,0 +1,286 @@
+"""Opt-in per-layer timing for CLI commands (--profile / TASK_MANAGER_PROFILE).
+
+Nothing here runs unless a profile is started: start() wraps the public
+methods of each layer (UndoManager, TaskManager, repositories, Task
+hydration) and swaps in a timing sqlite3 connection; stop() puts the
+originals back. With profiling off the code paths are exactly the
+uninstrumented ones.
+"""
+from __future__ import annotations
+import cProfile
+import functools
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+
+from . import storage as storage_module
+from .commands import UndoManager
+from .repository import InMemoryRepository
+from .service import TaskManager
+from .sharding import ShardedStorage
+from .storage import SQLiteStorage
+
+# classes whose public methods become spans, outermost layer first
+_LAYERS: List[Tuple[Any, str]] = [
+    (UndoManager, "UndoManager"),
+    (TaskManager, "TaskManager"),
+    (ShardedStorage, "ShardedStorage"),
+    (SQLiteStorage, "SQLiteStorage"),
+    (InMemoryRepository, "InMemoryRepository"),
+]
+
+
+class _Stat:
+    __slots__ = ("calls", "total", "self_time")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.self_time = 0.0
+
+
+class Profiler:
+    """Collects span totals, SQL statement timings and connection counts."""
+
+    def __init__(self, cprofile: bool = False) -> None:
+        self.spans: Dict[str, _Stat] = {}
+        self.statements: Dict[str, _Stat] = {}
+        self.connections = _Stat()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._restore: List[Tuple[Any, str, Any]] = []
+        self.cprofile = cProfile.Profile() if cprofile else None
+
+    # ---- spans ----
+    def _stack(self) -> List[List[float]]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def enter(self) -> None:
+        # frame: [start, time spent in child spans]
+        self._stack().append([time.perf_counter(), 0.0])
+
+    def exit(self, name: str) -> None:
+        stack = self._stack()
+        start, children = stack.pop()
+        elapsed = time.perf_counter() - start
+        if stack:
+            stack[-1][1] += elapsed
+        self.add(name, elapsed, elapsed - children)
+
+    def add(self, name: str, elapsed: float, self_time: Optional[float] = None):
+        """Record a span, e.g. one measured before profiling started."""
+        with self._lock:
+            stat = self.spans.setdefault(name, _Stat())
+            stat.calls += 1
+            stat.total += elapsed
+            stat.self_time += elapsed if self_time is None else self_time
+
+    def record_sql(self, sql: str, elapsed: float) -> None:
+        key = " ".join(sql.split())[:120]
+        with self._lock:
+            stat = self.statements.setdefault(key, _Stat())
+            stat.calls += 1
+            stat.total += elapsed
+
+    def record_connection(self, elapsed: float) -> None:
+        with self._lock:
+            self.connections.calls += 1
+            self.connections.total += elapsed
+
+    # ---- instrumentation ----
+    def _wrap(self, fn: Callable, name: str) -> Callable:
+        profiler = self
+        if inspect.isgeneratorfunction(fn):
+
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                # time each step, not the consumer's work between steps
+                gen = fn(*args, **kwargs)
+                while True:
+                    profiler.enter()
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        profiler.exit(name)
+                        return
+                    profiler.exit(name)
+                    yield item
+
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler.enter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.exit(name)
+
+        return wrapper
+
+    def _patch(self, owner: Any, attr: str, name: str) -> None:
+        original = vars(owner)[attr]
+        self._restore.append((owner, attr, original))
+        setattr(owner, attr, self._wrap(original, name))
+
+    def install(self) -> None:
+        for cls, label in _LAYERS:
+            for attr, value in list(vars(cls).items()):
+                if attr.startswith("_") or not inspect.isfunction(value):
+                    continue
+                self._patch(cls, attr, f"{label}.{attr}")
+        self._patch(storage_module, "_row_to_task", "Task hydration")
+        _ProfiledConnection.profiler = self
+        self._restore.append(
+            (SQLiteStorage, "connection_factory", SQLiteStorage.connection_factory)
+        )
+        SQLiteStorage.connection_factory = _ProfiledConnection
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def uninstall(self) -> None:
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        for owner, attr, original in reversed(self._restore):
+            setattr(owner, attr, original)
+        self._restore.clear()
+        _ProfiledConnection.profiler = None
+
+    # ---- output ----
+    def to_dict(self) -> dict:
+        def rows(stats: Dict[str, _Stat], key: str) -> List[dict]:
+            ordered = sorted(stats.items(), key=lambda kv: -kv[1].total)
+            return [
+                {
+                    key: name,
+                    "calls": s.calls,
+                    "total_ms": round(s.total * 1000, 3),
+                    "self_ms": round(s.self_time * 1000, 3),
+                }
+                for name, s in ordered
+            ]
+
+        statements = rows(self.statements, "sql")
+        for row in statements:
+            del row["self_ms"]
+        return {
+            "spans": rows(self.spans, "name"),
+            "sql": {
+                "statements": sum(s.calls for s in self.statements.values()),
+                "total_ms": round(
+                    sum(s.total for s in self.statements.values()) * 1000, 3
+                ),
+                "connections": self.connections.calls,
+                "connect_ms": round(self.connections.total * 1000, 3),
+                "by_statement": statements,
+            },
+        }
+
+    def summary(self) -> str:
+        data = self.to_dict()
+        lines = [f"{'span':<44} {'calls':>7} {'total ms':>10} {'self ms':>10}"]
+        for span in data["spans"]:
+            lines.append(
+                f"{span['name']:<44} {span['calls']:>7} "
+                f"{span['total_ms']:>10.3f} {span['self_ms']:>10.3f}"
+            )
+        sql = data["sql"]
+        lines.append(
+            f"SQL: {sql['statements']} statements in {sql['total_ms']:.3f}ms, "
+            f"{sql['connections']} connections opened in {sql['connect_ms']:.3f}ms"
+        )
+        for stmt in sql["by_statement"][:5]:
+            lines.append(
+                f"  {stmt['calls']:>5}x {stmt['total_ms']:>9.3f}ms  {stmt['sql']}"
+            )
+        return "\n".join(lines)
+
+    def write(self, path: str) -> None:
+        """Write a cProfile dump (.prof) or the span/SQL report as JSON."""
+        if path.endswith(".prof") and self.cprofile is not None:
+            self.cprofile.dump_stats(path)
+        else:
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+
+class _ProfiledCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(sql, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(sql, started)
+
+
+class _ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection factory that reports to the active Profiler."""
+
+    profiler: Optional[Profiler] = None
+
+    def __init__(self, *args, **kwargs):
+        started = time.perf_counter()
+        super().__init__(*args, **kwargs)
+        if self.profiler is not None:
+            self.profiler.record_connection(time.perf_counter() - started)
+
+    def cursor(self, factory=_ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _record_sql(sql: str, started: float) -> None:
+    profiler = _ProfiledConnection.profiler
+    if profiler is not None:
+        profiler.record_sql(sql, time.perf_counter() - started)
+
+
+_active: Optional[Profiler] = None
+
+
+def start(cprofile: bool = False) -> Profiler:
+    """Instrument every layer and open the outermost span."""
+    global _active
+    if _active is not None:
+        raise RuntimeError("a profile is already running")
+    _active = Profiler(cprofile=cprofile)
+    _active.install()
+    _active.enter()
+    return _active
+
+
+def stop(root_span: str, out: Optional[str] = None) -> Profiler:
+    """Close the outermost span, remove instrumentation and report."""
+    global _active
+    profiler = _active
+    if profiler is None:
+        raise RuntimeError("no profile is running")
+    profiler.exit(root_span)
+    profiler.uninstall()
+    _active = None
+    if out:
+        profiler.write(out)
+        click.echo(f"Profile written to {out}", err=True)
+    else:
+        click.echo(profiler.summary(), err=True)
+    return profiler
@@ -0,0 +1,144 @@
+"""Recurrence rules for repeating tasks and lazy occurrence expansion.
+
+A recurring task is stored once, as a template row whose `due` is the
+first occurrence. Occurrences are computed on demand for a window of
+dates and only become real rows (id "<template id>@<YYYY-MM-DD>") when
+one is completed or edited. Deleting an occurrence adds its date to the
+template's `skipped` list; deleting the template deletes the series.
+Expansion jumps straight to the window, so its cost depends on the
+window, not on how long the rule has run.
+
+Rules:
+    daily | weekly | monthly
+    every N days | every N weeks | every N months
+    weekdays                 (mon..fri)
+    mon,wed,fri              (weekly on those days)
+"""
+from __future__ import annotations
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import FrozenSet, Iterator, Optional, Tuple
+
+OCCURRENCE_SEP = "@"
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+UNITS = {"day": "day", "days": "day", "week": "week", "weeks": "week"}
+UNITS.update({"month": "month", "months": "month"})
+
+
+@dataclass(frozen=True)
+class Rule:
+    unit: str  # day, week or month
+    interval: int = 1
+    weekdays: Optional[FrozenSet[int]] = None  # 0 = Monday; weekly rules only
+
+    def __str__(self) -> str:
+        if self.weekdays is not None:
+            days = ",".join(WEEKDAYS[d] for d in sorted(self.weekdays))
+            if self.interval == 1:
+                return days
+            return f"every {self.interval} weeks {days}"
+        if self.interval == 1:
+            return {"day": "daily", "week": "weekly", "month": "monthly"}[self.unit]
+        return f"every {self.interval} {self.unit}s"
+
+
+def parse_rule(text: str) -> Rule:
+    """Parse a rule string (see the module docstring); raise ValueError."""
+    words = text.strip().lower().split()
+    simple = {"daily": "day", "weekly": "week", "monthly": "month"}
+    if len(words) == 1 and words[0] in simple:
+        return Rule(simple[words[0]])
+    if words == ["weekdays"]:
+        return Rule("week", weekdays=frozenset(range(5)))
+    interval = 1
+    if len(words) >= 3 and words[0] == "every" and words[2] in UNITS:
+        if not words[1].isdigit() or int(words[1]) < 1:
+            raise ValueError(f"bad interval in recurrence '{text}'")
+        interval = int(words[1])
+        unit = UNITS[words[2]]
+        if len(words) == 3:
+            return Rule(unit, interval)
+        if unit != "week" or len(words) != 4:
+            raise ValueError(f"unsupported recurrence '{text}'")
+        words = words[3:]
+    if len(words) == 1:
+        names = [n for n in words[0].split(",") if n]
+        if names and all(n in WEEKDAYS for n in names):
+            days = frozenset(WEEKDAYS.index(n) for n in names)
+            return Rule("week", interval, days)
+    raise ValueError(
+        f"unsupported recurrence '{text}'; use daily, weekly, monthly, "
+        "weekdays, 'every N days|weeks|months' or a list like mon,thu"
+    )
+
+
+def _add_months(anchor: date, months: int) -> date:
+    # the 31st of a short month falls on its last day
+    year, month = divmod(anchor.month - 1 + months, 12)
+    year += anchor.year
+    last = calendar.monthrange(year, month + 1)[1]
+    return date(year, month + 1, min(anchor.day, last))
+
+
+def occurrence_dates(
+    rule: Rule, anchor: date, since: date, until: date
+) -> Iterator[date]:
+    """Yield the rule's dates in [since, until], starting from anchor."""
+    since = max(since, anchor)
+    if since > until:
+        return
+    if rule.unit == "month":
+        months = (since.year - anchor.year) * 12 + since.month - anchor.month
+        step = max(0, months // rule.interval - 1)
+        while True:
+            day = _add_months(anchor, step * rule.interval)
+            if day > until:
+                return
+            if day >= since:
+                yield day
+            step += 1
+    elif rule.weekdays is None:
+        period = rule.interval * (7 if rule.unit == "week" else 1)
+        day = anchor + timedelta(days=-(-(since - anchor).days // period) * period)
+        while day <= until:
+            yield day
+            day += timedelta(days=period)
+    else:
+        week0 = anchor - timedelta(days=anchor.weekday())
+        week = (since - week0).days // 7 // rule.interval * rule.interval
+        while True:
+            start = week0 + timedelta(weeks=week)
+            if start > until:
+                return
+            for weekday in sorted(rule.weekdays):
+                day = start + timedelta(days=weekday)
+                if since <= day <= until:
+                    yield day
+            week += rule.interval
+
+
+def occurrences(
+    rule: Rule, first: datetime, since: datetime, until: datetime
+) -> Iterator[datetime]:
+    """Due datetimes in [since, until]; each keeps the first one's time of day."""
+    for day in occurrence_dates(rule, first.date(), since.date(), until.date()):
+        due = datetime.combine(day, first.time())
+        if since <= due <= until:
+            yield due
+
+
+def occurrence_id(template_id: str, day: date) -> str:
+    return f"{template_id}{OCCURRENCE_SEP}{day.isoformat()}"
+
+
+def split_occurrence_id(task_id: str) -> Optional[Tuple[str, date]]:
+    """(template id, date) for an occurrence id, None for any other id."""
+    template_id, sep, day = task_id.rpartition(OCCURRENCE_SEP)
+    if not sep:
+        return None
+    try:
+        return template_id, date.fromisoformat(day)
+    except ValueError:
+        return None
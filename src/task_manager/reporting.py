@@ -0,0 +1,141 @@
+"""Daily rollups behind the `report` command.
+
+Storage keeps one row per (day, dimension, key, metric) in daily_rollup
+and adjusts the counts on every task write, so reports only read the
+rollup and never scan tasks. A task contributes, on its creation day, a
+"created" count and, on its completion day, a "completed" count plus one
+lead-time histogram bucket, to each dimension it belongs to: "all", its
+project, each tag and its current status.
+"""
+from __future__ import annotations
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+# upper bounds (hours) of the lead-time histogram buckets
+LEAD_BUCKETS = (1, 4, 12, 24, 48, 72, 168, 336, 720, 2160, 8760)
+LEAD_OVERFLOW = "lead_le_inf"
+# what lead_time() reports for the overflow bucket; inf isn't valid JSON
+LEAD_OVERFLOW_HOURS = f">{LEAD_BUCKETS[-1]}"
+
+DIMENSIONS = ("all", "project", "tag", "status")
+
+RollupKey = Tuple[str, str, str, str]  # day, dimension, key, metric
+
+
+class TaskFacts(NamedTuple):
+    """The columns of a task row that the rollup depends on."""
+
+    created_at: Optional[str]
+    completed_at: Optional[str]
+    status: str
+    project: Optional[str]
+    tags: str
+    recurrence: Optional[str] = None
+
+
+def lead_metric(hours: float) -> str:
+    for bound in LEAD_BUCKETS:
+        if hours <= bound:
+            return f"lead_le_{bound}h"
+    return LEAD_OVERFLOW
+
+
+def contributions(facts: Optional[TaskFacts]) -> Counter:
+    """Rollup counts one task row adds; empty for a missing row or a series
+    template (its occurrences are counted once they become rows)."""
+    counts: Counter = Counter()
+    if facts is None or not facts.created_at or facts.recurrence:
+        return counts
+    members = [("all", ""), ("status", facts.status)]
+    if facts.project:
+        members.append(("project", facts.project))
+    members.extend(("tag", tag) for tag in facts.tags.split(",") if tag)
+
+    created_day = facts.created_at[:10]
+    done_day = lead = None
+    if facts.completed_at:
+        done_day = facts.completed_at[:10]
+        elapsed = datetime.fromisoformat(facts.completed_at) - datetime.fromisoformat(
+            facts.created_at
+        )
+        lead = lead_metric(max(0.0, elapsed.total_seconds() / 3600))
+    for dimension, key in members:
+        counts[(created_day, dimension, key, "created")] += 1
+        if done_day:
+            counts[(done_day, dimension, key, "completed")] += 1
+            counts[(done_day, dimension, key, lead)] += 1
+    return counts
+
+
+def delta(old: Optional[TaskFacts], new: Optional[TaskFacts]) -> Dict[RollupKey, int]:
+    """Changes to apply to the rollup when a row goes from old to new."""
+    change = contributions(new)
+    change.subtract(contributions(old))
+    return {k: v for k, v in change.items() if v}
+
+
+def _days(since: date, until: date) -> Iterable[str]:
+    day = since
+    while day <= until:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def throughput(
+    rows: Iterable[Tuple[str, str, int]], since: date, until: date
+) -> List[dict]:
+    """Created vs completed per day from (day, metric, count) rollup rows."""
+    per_day: Dict[str, Counter] = {}
+    for day, metric, count in rows:
+        per_day.setdefault(day, Counter())[metric] += count
+    return [
+        {
+            "day": day,
+            "created": per_day.get(day, Counter())["created"],
+            "completed": per_day.get(day, Counter())["completed"],
+        }
+        for day in _days(since, until)
+    ]
+
+
+def burndown(
+    rows: Iterable[Tuple[str, str, int]],
+    before: Dict[str, int],
+    since: date,
+    until: date,
+) -> List[dict]:
+    """Open tasks at the end of each day; `before` holds totals prior to since."""
+    remaining = before.get("created", 0) - before.get("completed", 0)
+    result = []
+    for row in throughput(rows, since, until):
+        remaining += row["created"] - row["completed"]
+        result.append({**row, "open": remaining})
+    return result
+
+
+def lead_time(totals: Dict[str, int], percentiles=(50, 90, 99)) -> dict:
+    """Lead-time percentiles (hours, as bucket upper bounds) from histogram totals.
+
+    Values are upper bounds of the buckets the percentile falls into, so
+    "p90_hours: 48" reads "90% of tasks were done within 48 hours"; past
+    the last bucket the value is LEAD_OVERFLOW_HOURS (">8760").
+    """
+    buckets: List[Tuple[str, Union[float, str]]] = [
+        (f"lead_le_{b}h", float(b)) for b in LEAD_BUCKETS
+    ]
+    buckets.append((LEAD_OVERFLOW, LEAD_OVERFLOW_HOURS))
+    count = sum(totals.get(name, 0) for name, _ in buckets)
+    result: dict = {"completed": count}
+    for pct in percentiles:
+        value = None
+        if count:
+            needed = pct / 100 * count
+            seen = 0
+            for name, bound in buckets:
+                seen += totals.get(name, 0)
+                if seen >= needed:
+                    value = bound
+                    break
+        result[f"p{pct}_hours"] = value
+    return result
@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
 from typing import List
-from .models import Task
+from .models import Project, Task
+
+
+class ConcurrentModificationError(Exception):
+    """Raised when a task was saved by someone else since it was loaded."""
 
 
 class Repository(ABC):
@@ -19,7 +23,20 @@ class InMemoryRepository:
         self.projects = {}
 
     # ---- Task methods ----
-    def save_task(self, task):
+    def save_task(self, task, project_id=None, *, recreate=False):
+        # project_id joins a new task to that project
+        existing = self.tasks.get(task.id)
+        if (
+            existing is not None
+            and existing is not task
+            and existing.version != task.version
+        ):
+            raise ConcurrentModificationError(f"Task {task.id} changed since read")
+        if existing is None and task.version and not recreate:
+            raise ConcurrentModificationError(f"Task {task.id} was deleted")
+        if existing is None and project_id is not None:
+            self.projects[project_id].task_ids.append(task.id)
+        task.version += 1
         self.tasks[task.id] = task
 
     def get_task(self, task_id):
@@ -31,6 +48,9 @@ class InMemoryRepository:
     def delete_task(self, task_id):
         self.tasks.pop(task_id, None)
 
+    def list_occurrences(self, template_id):
+        return [t for t in self.tasks.values() if t.series == template_id]
+
     # ---- Project methods ----
     def save_project(self, project):
         self.projects[project.id] = project
@@ -44,6 +64,19 @@ class InMemoryRepository:
                 return p
         return None
 
+    def ensure_project(self, name):
+        project = self.find_project_by_name(name)
+        if project is None:
+            project = Project(name=name)
+            self.projects[project.id] = project
+        return project.id
+
+    def find_project_by_task(self, task_id):
+        for p in self.projects.values():
+            if task_id in p.task_ids:
+                return p
+        return None
+
     def delete_project(self, project_id):
         self.projects.pop(project_id, None)
 
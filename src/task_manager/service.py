@@ -1,7 +1,9 @@
 from __future__ import annotations
 from typing import List, Optional, Tuple
-from .models import Task, Project
-from .repository import Repository
+from .models import Task
+from .recurrence import occurrences, parse_rule, split_occurrence_id
+from .repository import ConcurrentModificationError, Repository
+from .sorting import DEFAULT_SORT, SortSpec, top_k
 from datetime import datetime
 
 
@@ -21,43 +23,110 @@ class TaskManager:
         priority: int = 3,
         tags: Optional[List[str]] = None,
         project_name: Optional[str] = None,
+        recurrence: Optional[str] = None,
     ) -> Task:
         tags = list(tags or [])
         t = Task(
             title=title, description=description, due=due, priority=priority, tags=tags
         )
+        if recurrence is not None:
+            # stored in canonical form, e.g. "every 1 weeks" -> "weekly"
+            t.recurrence = str(parse_rule(recurrence))
         t.validate()  # ensure basic validation before save
-        self.repo.save_task(t)
-        if project_name:
-            p = (
-                self.repo.find_project_by_name(project_name)
-                if hasattr(self.repo, "find_project_by_name")
-                else None
-            )
-            if p:
-                p.add_task(t)
-                self.repo.save_project(p)
-            else:
-                p = Project(name=project_name, task_ids=[t.id])
-                self.repo.save_project(p)
+        project_id = self.repo.ensure_project(project_name) if project_name else None
+        # saving with the project id is the membership write, so the cost
+        # doesn't grow with the project; sharded storage also places the
+        # task on the project's shard
+        self.repo.save_task(t, project_id=project_id)
         return t
 
-    def update_task(self, task_id: str, **fields) -> Task:
-        t = self.repo.get_task(task_id)
+    def update_task(
+        self, task_id: str, *, expected_version: Optional[int] = None, **fields
+    ) -> Task:
+        t = self._load(task_id)
         if not t:
             raise BusinessError(f"Task {task_id} not found")
+        # callers that computed fields from an earlier read pass its version
+        if expected_version is not None and t.version != expected_version:
+            raise BusinessError(
+                f"Task {task_id} was modified concurrently; reload and retry"
+            )
         # only allow certain fields to be updated
-        allowed = {"title", "description", "due", "priority", "tags", "deps", "status"}
+        allowed = {
+            "title",
+            "description",
+            "due",
+            "priority",
+            "tags",
+            "deps",
+            "status",
+            "recurrence",
+        }
         for k, v in fields.items():
             if k not in allowed:
                 continue
             setattr(t, k, v)
+        if t.recurrence is not None:
+            t.recurrence = str(parse_rule(t.recurrence))
+        # keep the completion timestamp in step with the status
+        if t.status == "done" and t.completed_at is None:
+            t.completed_at = datetime.utcnow()
+        elif t.status != "done":
+            t.completed_at = None
         t.validate()
-        self.repo.save_task(t)
+        self._save_checked(t)
         return t
 
-    def list_tasks(self):
-        return self.repo.list_tasks()
+    def _save_checked(self, task: Task) -> None:
+        """Save an edited task; a lost compare-and-swap becomes a BusinessError."""
+        project = None
+        if task.series is not None and task.version == 0:
+            # a new occurrence joins its series' project
+            project = self.repo.find_project_by_task(task.series)
+        try:
+            self.repo.save_task(task, project_id=project.id if project else None)
+        except ConcurrentModificationError as e:
+            raise BusinessError(
+                f"Task {task.id} was modified concurrently; reload and retry"
+            ) from e
+
+    def _load(self, task_id: str) -> Optional[Task]:
+        """A stored task, or an unsaved occurrence of a recurring one.
+
+        Occurrences only become rows when they are saved, i.e. completed or
+        edited; until then they are rebuilt from the series template.
+        """
+        task = self.repo.get_task(task_id)
+        occurrence = split_occurrence_id(task_id) if task is None else None
+        if occurrence is None:
+            return task
+        template = self.repo.get_task(occurrence[0])
+        if template is None or template.recurrence is None or template.due is None:
+            return None
+        if occurrence[1].isoformat() in template.skipped:
+            return None
+        due = datetime.combine(occurrence[1], template.due.time())
+        rule = parse_rule(template.recurrence)
+        if next(occurrences(rule, template.due, due, due), None) != due:
+            return None
+        return Task(
+            id=task_id,
+            title=template.title,
+            description=template.description,
+            due=due,
+            priority=template.priority,
+            tags=list(template.tags),
+            deps=list(template.deps),
+            series=template.id,
+        )
+
+    def list_tasks(
+        self, sort: Optional[SortSpec] = None, limit: Optional[int] = None
+    ) -> List[Task]:
+        tasks = self.repo.list_tasks()
+        if sort is None and limit is None:
+            return tasks
+        return top_k(tasks, sort or DEFAULT_SORT, limit)
 
     def _blocking_dependencies(self, task: Task) -> List[str]:
         """Return list of dependency IDs that are not done or missing."""
@@ -69,32 +138,54 @@ class TaskManager:
         return blocking
 
     def can_complete(self, task_id: str) -> Tuple[bool, List[str]]:
-        t = self.repo.get_task(task_id)
+        t = self._load(task_id)
         if not t:
             raise BusinessError(f"Task {task_id} not found")
         blocking = self._blocking_dependencies(t)
         return (len(blocking) == 0, blocking)
 
     def mark_complete(self, task_id: str) -> Task:
-        t = self.repo.get_task(task_id)
+        t = self._load(task_id)
         if not t:
             raise BusinessError(f"Task {task_id} not found")
+        if t.recurrence is not None:
+            raise BusinessError(
+                f"Task {task_id} repeats {t.recurrence}; complete an occurrence "
+                "(<id>@YYYY-MM-DD) instead"
+            )
         ok, blocking = self.can_complete(task_id)
         if not ok:
             raise BusinessError(f"Cannot complete task; blocking deps: {blocking}")
         t.mark_done()
-        self.repo.save_task(t)
+        self._save_checked(t)
         return t
 
     def delete_task(self, task_id: str) -> None:
+        task = self._load(task_id)
+        doomed = [task_id]
+        if task is not None and task.series is not None:
+            # record the skip on the template, or the series would expand
+            # the occurrence again
+            template = self.repo.get_task(task.series)
+            occurrence = split_occurrence_id(task_id)
+            day = occurrence[1].isoformat() if occurrence else None
+            if template is not None and day and day not in template.skipped:
+                template.skipped.append(day)
+                self._save_checked(template)
+        elif task is not None and task.recurrence is not None:
+            # a deleted series takes its materialized occurrences with it
+            doomed += [t.id for t in self.repo.list_occurrences(task_id)]
         # remove references from projects
         for p in self.repo.list_projects():
-            if task_id in p.task_ids:
-                p.remove_task(task_id)
+            members = [tid for tid in doomed if tid in p.task_ids]
+            for tid in members:
+                p.remove_task(tid)
+            if members:
                 self.repo.save_project(p)
         # delete task record
         if hasattr(self.repo, "delete_task"):
-            self.repo.delete_task(task_id)
+            for tid in doomed:
+                self.repo.delete_task(tid)
         else:
             raise BusinessError("Repository does not support delete_task")
 
@@ -111,15 +202,17 @@ class TaskManager:
         return {"project": p.name, "total": total, "done": done, "open": open_count}
 
     def get_task(self, task_id: str) -> Task:
-        task = self.repo.get_task(task_id)
+        task = self._load(task_id)
         if task is None:
             raise BusinessError("Task not found")
         return task
 
     def uncomplete_task(self, task_id: str) -> None:
         task = self.get_task(task_id)
-        task.completed = False
+        task.status = "open"
+        task.completed_at = None
         self.repo.save_task(task)
         
     def restore_task(self, task: Task) -> None:
-        self.repo.save_task(task)
+        # undoing a delete puts back a row that is gone on purpose
+        self.repo.save_task(task, recreate=True)
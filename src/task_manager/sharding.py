@@ -0,0 +1,419 @@
+"""Tasks partitioned across several SQLite files behind the SQLiteStorage API."""
+from __future__ import annotations
+import functools
+import heapq
+import itertools
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from .models import Project, Task
+from .recurrence import split_occurrence_id
+from .sorting import DEFAULT_SORT, row_sort_key
+from .storage import SQLiteStorage
+
+PARTITIONS = ("hash", "project")
+
+# rows a shard stream hands over at a time, and how many batches it may
+# read ahead of the merge
+STREAM_BATCH = 256
+STREAM_DEPTH = 4
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def _bucket(key: str, n: int) -> int:
+    return zlib.crc32(key.encode()) % n
+
+
+def _prefetch(rows: Callable[[], Iterable[T]]) -> Iterator[T]:
+    """Iterate rows() on a background thread, a few batches ahead.
+
+    A thread of its own rather than the shared pool: a producer blocks
+    while its buffer is full, and blocked producers of several merges
+    could otherwise hold every worker. Closing the iterator stops it.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=STREAM_DEPTH)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        source: Iterator[T] = iter(())
+        try:
+            source = iter(rows())
+            while True:
+                batch = list(itertools.islice(source, STREAM_BATCH))
+                if not batch:
+                    put(_DONE)
+                    return
+                if not put(batch):
+                    return
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+    def drain() -> Iterator[T]:
+        try:
+            while True:
+                item = buffer.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield from item
+        finally:
+            stop.set()
+
+    # started here, not on first next(), so every shard's query runs at once
+    threading.Thread(target=produce, name="shard-stream", daemon=True).start()
+    return drain()
+
+
+def _placement_key(task_id: str) -> str:
+    # occurrences of a recurring task live next to its template, so the
+    # shard expanding the series can see which ones are materialized
+    occurrence = split_occurrence_id(task_id)
+    return occurrence[0] if occurrence else task_id
+
+
+class ShardedStorage:
+    """Drop-in SQLiteStorage replacement spread over N database files.
+
+    partition="hash" places each task by a hash of its id, so point lookups
+    go straight to one shard. partition="project" keeps a project's tasks
+    together on the shard its id hashes to, so writes to different projects
+    take different file locks; new tasks are created there and existing
+    ones move there when added to the project. There, looking up a task by
+    id asks every shard once per process and remembers the answer, asking
+    again if the task has since moved.
+
+    A project row lives on its home shard (the one its id hashes to) and on
+    any shard that holds, or in hash mode may hold, some of its tasks; task
+    membership lives with the task, and saving a project only writes to
+    shards whose share of it changed. Queries spanning shards run on a thread pool and sorted results
+    are combined with a streaming k-way merge. Transactions cover each shard
+    separately and are not atomic across files.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        shards: int = 4,
+        partition: str = "hash",
+        workers: Optional[int] = None,
+        **storage_kwargs,
+    ):
+        if partition not in PARTITIONS:
+            raise ValueError(f"partition must be one of {PARTITIONS}")
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.partition = partition
+        self.shards = [
+            SQLiteStorage(self.directory / f"shard-{i:02d}.db", **storage_kwargs)
+            for i in range(shards)
+        ]
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers or shards, thread_name_prefix="shard"
+        )
+        # task id -> shard index, for partition="project" where ids don't
+        # determine placement
+        self._locations: Dict[str, int] = {}
+
+    # ---- routing ----
+    def _in_transaction(self) -> bool:
+        return any(s._tx_conn is not None for s in self.shards)
+
+    def _run_all(self, calls: Sequence[Callable[[], T]]) -> List[T]:
+        # a transaction's connections belong to this thread; pool threads
+        # would not see its uncommitted writes
+        if self._in_transaction() or len(calls) == 1:
+            return [call() for call in calls]
+        return list(self._pool.map(lambda call: call(), calls))
+
+    def _fanout(self, fn: Callable[[SQLiteStorage], T]) -> List[T]:
+        return self._run_all([functools.partial(fn, s) for s in self.shards])
+
+    def _stream(self, fn: Callable[[SQLiteStorage], Iterable[T]]) -> List[Iterator[T]]:
+        """One lazily read iterator per shard, each filled in the background."""
+        if self._in_transaction() or len(self.shards) == 1:
+            return [iter(fn(s)) for s in self.shards]
+        return [_prefetch(functools.partial(fn, s)) for s in self.shards]
+
+    def _locate(self, task_id: str, verify: bool = False) -> Optional[int]:
+        """Shard index holding task_id, or None.
+
+        In project mode the cached answer can be stale once another process
+        moves the task; verify=True checks the cached shard first and asks
+        every shard again if the task is gone from it.
+        """
+        if self.partition == "hash":
+            return _bucket(_placement_key(task_id), len(self.shards))
+        index = self._locations.get(task_id)
+        if index is not None:
+            if not verify or self.shards[index].get_task(task_id) is not None:
+                return index
+            del self._locations[task_id]
+        found = self._fanout(lambda s: s.get_task(task_id) is not None)
+        for index, present in enumerate(found):
+            if present:
+                self._locations[task_id] = index
+                return index
+        return None
+
+    # ---- tasks ----
+    def save_task(
+        self, task: Task, project_id: Optional[str] = None, *, recreate: bool = False
+    ) -> None:
+        # a task that was never saved (version 0) can't live anywhere yet
+        index = self._locate(task.id, verify=True) if task.version else None
+        if index is None and task.series is not None:
+            index = self._locate(task.series, verify=True)
+        if index is None and project_id is not None and self.partition == "project":
+            index = _bucket(project_id, len(self.shards))
+        if index is None:
+            index = _bucket(_placement_key(task.id), len(self.shards))
+        self.shards[index].save_task(task, project_id=project_id, recreate=recreate)
+        if self.partition == "project":
+            self._locations[task.id] = index
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        index = self._locate(task_id)
+        task = self.shards[index].get_task(task_id) if index is not None else None
+        if task is None and self._locations.pop(task_id, None) is not None:
+            # moved by another process since we cached where it was
+            return self.get_task(task_id)
+        return task
+
+    def delete_task(self, task_id: str) -> None:
+        index = self._locate(task_id, verify=True)
+        if index is not None:
+            self.shards[index].delete_task(task_id)
+        self._locations.pop(task_id, None)
+
+    def complete_task(self, task_id: str) -> None:
+        index = self._locate(task_id, verify=True)
+        if index is not None:
+            self.shards[index].complete_task(task_id)
+
+    def list_tasks(self) -> List[Task]:
+        parts = self._fanout(SQLiteStorage.list_tasks)
+        return list(itertools.chain.from_iterable(parts))
+
+    def list_occurrences(self, template_id: str) -> List[Task]:
+        parts = self._fanout(lambda s: s.list_occurrences(template_id))
+        return list(itertools.chain.from_iterable(parts))
+
+    def iter_tasks(
+        self,
+        fields: Sequence[str],
+        project_id: Optional[str] = None,
+        tag: Optional[str] = None,
+        due_before: Optional[datetime] = None,
+        overdue_on: Optional[datetime] = None,
+        sort: Sequence[Tuple[str, bool]] = DEFAULT_SORT,
+        limit: Optional[int] = None,
+        due_after: Optional[datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Query every shard in parallel and merge their sorted rows lazily.
+
+        Each shard applies the filters, ORDER BY and LIMIT itself and is read
+        at most STREAM_DEPTH batches ahead of the merge, so memory stays
+        bounded without a limit too.
+        """
+        sort = list(sort)
+        fetched = list(fields)
+        for name in [key for key, _ in sort] + ["id"]:
+            if name not in fetched:
+                fetched.append(name)
+
+        def query(shard: SQLiteStorage) -> Iterator[Dict[str, Any]]:
+            return shard.iter_tasks(
+                fetched,
+                project_id=project_id,
+                tag=tag,
+                due_before=due_before,
+                overdue_on=overdue_on,
+                sort=sort,
+                limit=limit,
+                due_after=due_after,
+            )
+
+        streams = self._stream(query)
+        try:
+            merged = heapq.merge(*streams, key=row_sort_key(sort))
+            for row in itertools.islice(merged, limit):
+                yield {f: row[f] for f in fields}
+        finally:
+            for stream in streams:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
+    # ---- projects ----
+    def save_project(self, project: Project) -> None:
+        home = _bucket(project.id, len(self.shards))
+        # reading every shard's share takes no write locks
+        before = self._fanout(lambda s: s.get_project(project.id))
+        held = {tid: i for i, p in enumerate(before) if p for tid in p.task_ids}
+        if self.partition == "project":
+            self._locations.update(held)
+        parts = [Project(id=project.id, name=project.name) for _ in self.shards]
+        for task_id in project.task_ids:
+            index = held.get(task_id)
+            if index is None:
+                index = self._locate(task_id, verify=True)
+            if index is not None and self.partition == "project" and index != home:
+                index = self._move_task(task_id, index, home)
+            if index is not None:
+                parts[index].task_ids.append(task_id)
+        calls = []
+        for index, (shard, old, new) in enumerate(zip(self.shards, before, parts)):
+            if old is None:
+                changed = index == home or bool(new.task_ids)
+            else:
+                changed = set(old.task_ids) != set(new.task_ids)
+            if changed:
+                calls.append(functools.partial(shard.save_project, new))
+        self._run_all(calls)
+
+    def _move_task(self, task_id: str, source: int, target: int) -> Optional[int]:
+        task = self.shards[source].get_task(task_id)
+        if task is None:
+            return None
+        self.shards[target].save_task(task, recreate=True)
+        self.shards[source].delete_task(task_id)
+        self._locations[task_id] = target
+        return target
+
+    def _merge_projects(self, parts: List[Optional[Project]]) -> Optional[Project]:
+        found = [p for p in parts if p is not None]
+        if not found:
+            return None
+        return Project(
+            id=found[0].id,
+            name=found[0].name,
+            task_ids=[tid for p in found for tid in p.task_ids],
+        )
+
+    def get_project(self, project_id: str) -> Optional[Project]:
+        return self._merge_projects(self._fanout(lambda s: s.get_project(project_id)))
+
+    def find_project_by_name(self, name: str) -> Optional[Project]:
+        return self._merge_projects(
+            self._fanout(lambda s: s.find_project_by_name(name))
+        )
+
+    def ensure_project(self, name: str) -> str:
+        found = self._fanout(lambda s: s.find_project_id(name))
+        known = [project_id for project_id in found if project_id is not None]
+        project_id = known[0] if known else Project(name=name).id
+        home = _bucket(project_id, len(self.shards))
+        if found[home] is None:
+            project_id = self.shards[home].ensure_project(name, project_id)
+        # in hash mode a new task can land on any shard, which needs the row
+        # to report the task as a member
+        if self.partition == "hash":
+            missing = [s for s, i in zip(self.shards, found) if i is None]
+            self._run_all(
+                [functools.partial(s.ensure_project, name, project_id) for s in missing]
+            )
+        return project_id
+
+    def find_project_by_task(self, task_id: str) -> Optional[Project]:
+        index = self._locate(task_id, verify=True)
+        if index is None:
+            return None
+        part = self.shards[index].find_project_by_task(task_id)
+        return self.get_project(part.id) if part else None
+
+    def list_projects(self) -> List[Project]:
+        merged: Dict[str, Project] = {}
+        for projects in self._fanout(SQLiteStorage.list_projects):
+            for p in projects:
+                if p.id in merged:
+                    merged[p.id].task_ids.extend(p.task_ids)
+                else:
+                    merged[p.id] = p
+        return list(merged.values())
+
+    def iter_projects(self, fields: Sequence[str]) -> Iterator[Dict[str, Any]]:
+        fetched = ("id", "name", "tasks")
+        merged: Dict[str, Dict[str, Any]] = {}
+        for rows in self._fanout(lambda s: list(s.iter_projects(fetched))):
+            for row in rows:
+                if row["id"] in merged:
+                    merged[row["id"]]["tasks"] += row["tasks"]
+                else:
+                    merged[row["id"]] = row
+        for row in merged.values():
+            yield {f: row[f] for f in fields}
+
+    def delete_project(self, project_id: str) -> None:
+        self._fanout(lambda s: s.delete_project(project_id))
+
+    # ---- reporting ----
+    def rollup_rows(
+        self, dimension: str, key: str, since: date, until: date
+    ) -> List[Tuple[str, str, int]]:
+        summed: Counter = Counter()
+        for rows in self._fanout(lambda s: s.rollup_rows(dimension, key, since, until)):
+            for day, metric, count in rows:
+                summed[(day, metric)] += count
+        return [(day, metric, count) for (day, metric), count in summed.items()]
+
+    def rollup_totals(
+        self,
+        dimension: str,
+        key: str,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+    ) -> Dict[str, int]:
+        summed: Counter = Counter()
+        for totals in self._fanout(
+            lambda s: s.rollup_totals(dimension, key, since, until)
+        ):
+            summed.update(totals)
+        return dict(summed)
+
+    def rebuild_rollup(self) -> None:
+        self._fanout(SQLiteStorage.rebuild_rollup)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Open a transaction on every shard; each commits separately."""
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.transaction())
+            yield
@@ -0,0 +1,93 @@
+"""Sort specs for list-tasks and bounded top-K selection for in-memory lists."""
+from __future__ import annotations
+import heapq
+from functools import total_ordering
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .models import Task
+
+SortSpec = List[Tuple[str, bool]]  # (key, descending)
+
+DEFAULT_SORT: SortSpec = [("status", False), ("priority", False)]
+
+# --sort key -> Task attribute getter (storage.SORT_COLUMNS is the SQL side)
+SORT_KEYS: Dict[str, Callable[[Task], Any]] = {
+    "priority": lambda t: t.priority,
+    "due": lambda t: t.due,
+    "created": lambda t: t.created_at,
+    "title": lambda t: t.title,
+    "status": lambda t: t.status,
+}
+
+
+def parse_sort(specs: Iterable[str]) -> SortSpec:
+    """Parse "priority,due:desc"-style specs (repeatable) into (key, desc) pairs."""
+    result: SortSpec = []
+    for spec in specs:
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            key, _, direction = part.partition(":")
+            if key not in SORT_KEYS:
+                raise ValueError(
+                    f"unknown sort key '{key}'; choose from {', '.join(SORT_KEYS)}"
+                )
+            if direction not in ("", "asc", "desc"):
+                raise ValueError(
+                    f"sort direction must be asc or desc, not '{direction}'"
+                )
+            result.append((key, direction == "desc"))
+    return result
+
+
+@total_ordering
+class _SortKey:
+    """Compares tasks on mixed asc/desc keys, None always last (like SQL)."""
+
+    __slots__ = ("values", "sort")
+
+    def __init__(self, values: Tuple[Any, ...], sort: SortSpec) -> None:
+        self.values = values
+        self.sort = sort
+
+    def __eq__(self, other) -> bool:
+        return self.values == other.values
+
+    def __lt__(self, other) -> bool:
+        for (_, desc), a, b in zip(self.sort, self.values, other.values):
+            if a == b:
+                continue
+            if a is None:
+                return False
+            if b is None:
+                return True
+            return a > b if desc else a < b
+        return False
+
+
+def sort_key(sort: SortSpec) -> Callable[[Task], _SortKey]:
+    getters = [SORT_KEYS[key] for key, _ in sort] + [lambda t: t.id]
+    full = list(sort) + [("id", False)]
+    return lambda t: _SortKey(tuple(g(t) for g in getters), full)
+
+
+def row_sort_key(sort: SortSpec) -> Callable[[Dict[str, Any]], _SortKey]:
+    """Like sort_key() for iter_tasks() rows; they must hold the sort fields."""
+    names = [key for key, _ in sort] + ["id"]
+    full = list(sort) + [("id", False)]
+    return lambda row: _SortKey(tuple(row[n] for n in names), full)
+
+
+def top_k(
+    tasks: Iterable[Task], sort: Sequence[Tuple[str, bool]], limit: Optional[int]
+) -> List[Task]:
+    """Sort tasks; with a limit keep only the first K using a bounded heap.
+
+    heapq.nsmallest holds K items at a time, so this is O(n log K) rather
+    than sorting all n tasks.
+    """
+    key = sort_key(list(sort))
+    if limit is None:
+        return sorted(tasks, key=key)
+    return heapq.nsmallest(limit, tasks, key=key)
@@ -1,25 +1,188 @@
+import functools
+import heapq
+import itertools
+import random
 import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import List, Optional
-from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from datetime import date, datetime, timedelta
 
 from .models import Task, Project
+from .reporting import TaskFacts, contributions, delta
+from .repository import ConcurrentModificationError
+from .recurrence import occurrence_id, occurrences, parse_rule
+from .sorting import DEFAULT_SORT, row_sort_key
+
+# columns read back into a Task, in _row_to_task order
+_TASK_COLUMNS = (
+    "id, title, status, due_date, tags, description, priority, created_at, "
+    "version, deps, completed_at, recurrence, series, skipped"
+)
+
+# columns the reporting rollup is derived from, in TaskFacts order
+_FACT_COLUMNS = "created_at, completed_at, status, project, tags, recurrence"
+
+# public field name -> SQL expression, used by iter_tasks() projections
+TASK_FIELDS: Dict[str, str] = {
+    "id": "t.id",
+    "title": "t.title",
+    "description": "t.description",
+    "status": "t.status",
+    "due": "t.due_date",
+    "priority": "t.priority",
+    "tags": "t.tags",
+    "project": "p.name",
+    "created": "t.created_at",
+}
+
+# --sort key -> column; every key has a matching index below
+SORT_COLUMNS: Dict[str, str] = {
+    "priority": "t.priority",
+    "due": "t.due_date",
+    "created": "t.created_at",
+    "title": "t.title",
+    "status": "t.status",
+}
+
+PROJECT_FIELDS: Dict[str, str] = {
+    "id": "p.id",
+    "name": "p.name",
+    "tasks": "COUNT(t.id)",
+}
+
+
+def _row_to_task(row) -> Task:
+    task = Task(
+        id=row[0],
+        title=row[1],
+        status=row[2],
+        due=datetime.fromisoformat(row[3]) if row[3] else None,
+        tags=row[4].split(",") if row[4] else [],
+        description=row[5] or "",
+        priority=row[6] if row[6] is not None else 3,
+    )
+    if row[7]:
+        task.created_at = datetime.fromisoformat(row[7])
+    task.version = row[8]
+    task.deps = row[9].split(",") if row[9] else []
+    task.completed_at = datetime.fromisoformat(row[10]) if row[10] else None
+    task.recurrence = row[11]
+    task.series = row[12]
+    task.skipped = row[13].split(",") if row[13] else []
+    return task
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def _retry_on_busy(method):
+    """Retry a write with jittered exponential backoff while the db is locked.
+
+    busy_timeout already makes SQLite wait for the lock; this covers the
+    cases where it gives up immediately (e.g. a WAL snapshot went stale).
+    Inside transaction() the error is re-raised, since only the caller can
+    replay the whole transaction.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(self.busy_retries + 1):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if (
+                    not _is_busy(e)
+                    or self._tx_conn is not None
+                    or attempt == self.busy_retries
+                ):
+                    raise
+                time.sleep(random.uniform(0, min(1.0, 0.01 * 2**attempt)))
+
+    return wrapper
 
 
 class SQLiteStorage:
-    def __init__(self, db_path: Optional[Path] = None):
+    # swapped for a timing subclass by profiling.start()
+    connection_factory = sqlite3.Connection
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        busy_timeout: float = 5.0,
+        busy_retries: int = 5,
+    ):
         if db_path is None:
             db_path = Path("task_data.db")
 
         self.db_path = db_path
+        # seconds SQLite waits on a locked database, then backoff retries
+        self.busy_timeout = busy_timeout
+        self.busy_retries = busy_retries
+        # per-thread so a daemon's reader threads never share a writer's
+        # open transaction
+        self._local = threading.local()
         self._init_db()
 
+    @property
+    def _tx_conn(self) -> Optional[sqlite3.Connection]:
+        return getattr(self._local, "tx_conn", None)
+
+    @_tx_conn.setter
+    def _tx_conn(self, conn: Optional[sqlite3.Connection]) -> None:
+        self._local.tx_conn = conn
+
     def _connect(self):
-        return sqlite3.connect(self.db_path)
+        # inside transaction() every statement shares one connection and the
+        # commit is deferred to the end of the block
+        if self._tx_conn is not None:
+            return nullcontext(self._tx_conn)
+        return sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout, factory=self.connection_factory
+        )
+
+    @staticmethod
+    def _lock_for_write(conn: sqlite3.Connection) -> None:
+        # take the write lock before reading the rows a rollup delta is
+        # computed from, or two writers can both apply a delta for the
+        # same old row
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run every storage call in the block on one connection and commit once.
+
+        Rolls back everything done in the block if it raises. Nested calls join
+        the outer transaction.
+        """
+        if self._tx_conn is not None:
+            yield self._tx_conn
+            return
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout, factory=self.connection_factory
+        )
+        self._tx_conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._tx_conn = None
+            conn.close()
 
     def _init_db(self):
         with self._connect() as conn:
             cursor = conn.cursor()
+            # WAL lets readers run while another process writes
+            cursor.execute("PRAGMA journal_mode=WAL")
 
             cursor.execute(
                 """
@@ -38,113 +201,639 @@ class SQLiteStorage:
                     status TEXT NOT NULL,
                     due_date TEXT,
                     project TEXT,
-                    tags TEXT
+                    tags TEXT,
+                    description TEXT NOT NULL DEFAULT '',
+                    priority INTEGER NOT NULL DEFAULT 3,
+                    created_at TEXT,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    deps TEXT NOT NULL DEFAULT '',
+                    completed_at TEXT,
+                    recurrence TEXT,
+                    series TEXT,
+                    skipped TEXT NOT NULL DEFAULT ''
                 )
             """
             )
+            # databases created before these columns existed
+            self._ensure_columns(
+                cursor,
+                "tasks",
+                {
+                    "description": "TEXT NOT NULL DEFAULT ''",
+                    "priority": "INTEGER NOT NULL DEFAULT 3",
+                    "created_at": "TEXT",
+                    "version": "INTEGER NOT NULL DEFAULT 1",
+                    "deps": "TEXT NOT NULL DEFAULT ''",
+                    "completed_at": "TEXT",
+                    "recurrence": "TEXT",
+                    "series": "TEXT",
+                    "skipped": "TEXT NOT NULL DEFAULT ''",
+                },
+            )
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = 'daily_rollup'"
+            )
+            has_rollup = cursor.fetchone() is not None
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_rollup (
+                    dimension TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (dimension, key, day, metric)
+                ) WITHOUT ROWID
+            """
+            )
+            if not has_rollup:
+                # first open after upgrading: derive it from existing tasks
+                self._rebuild_rollup(cursor)
+            for name, columns in (
+                ("project", "project"),
+                ("status_priority", "status, priority"),
+                ("priority_due", "priority, due_date"),
+                ("due", "due_date"),
+                ("created", "created_at"),
+                ("title", "title"),
+            ):
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_tasks_{name} ON tasks ({columns})"
+                )
+            self._init_change_tracking(cursor)
 
+    @staticmethod
+    def _init_change_tracking(cursor) -> None:
+        # change sequence for incremental backups (see backup.py): the last
+        # seq that touched each row, deletions kept as tombstones. Triggers
+        # cover every write path, including raw UPDATEs such as
+        # complete_task. The counter lives in its own row so a row's seq
+        # never repeats even when its previous entry was the newest.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS row_changes (
+                tbl TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (tbl, row_id)
+            ) WITHOUT ROWID
+        """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_row_changes_seq ON row_changes (seq)"
+        )
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS change_counter "
+            "(id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL)"
+        )
+        cursor.execute("INSERT OR IGNORE INTO change_counter (id, seq) VALUES (1, 0)")
+        for table in ("tasks", "projects"):
+            for event, ref, deleted in (
+                ("INSERT", "NEW", 0),
+                ("UPDATE", "NEW", 0),
+                ("DELETE", "OLD", 1),
+            ):
+                # plain DELETE + INSERT: a trigger inherits the conflict
+                # policy of the statement that fired it (e.g. INSERT OR IGNORE)
+                cursor.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_seq
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+                        DELETE FROM row_changes
+                        WHERE tbl = '{table}' AND row_id = {ref}.id;
+                        INSERT INTO row_changes (tbl, row_id, seq, deleted)
+                        VALUES ('{table}', {ref}.id,
+                                (SELECT seq FROM change_counter WHERE id = 1),
+                                {deleted});
+                    END
+                """
+                )
+
+    @staticmethod
+    def _ensure_columns(cursor, table: str, columns: Dict[str, str]) -> None:
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+    @_retry_on_busy
     def save_project(self, project: Project) -> None:
+        """Create or update a project and set its membership to task_ids.
+
+        If another writer already created a project with this name, that is
+        the project being saved: project.id is changed to the stored id and
+        task_ids are added to its members rather than replacing them.
+        """
         with self._connect() as conn:
+            self._lock_for_write(conn)
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT OR IGNORE INTO projects (id, name) VALUES (?, ?)",
                 (project.id, project.name),
             )
+            cursor.execute("SELECT id FROM projects WHERE name = ?", (project.name,))
+            row = cursor.fetchone()
+            adopted = row is not None and row[0] != project.id
+            if adopted:
+                project.id = row[0]
+            # membership lives on tasks.project
+            cursor.execute("SELECT id FROM tasks WHERE project = ?", (project.id,))
+            current = {r[0] for r in cursor.fetchall()}
+            wanted = set(project.task_ids)
+            if adopted:
+                # the caller never saw the other writer's members
+                project.task_ids.extend(sorted(current - wanted))
+                wanted |= current
+            removed, added = current - wanted, wanted - current
+            before = self._facts(cursor, removed | added)
+            cursor.executemany(
+                "UPDATE tasks SET project = NULL WHERE id = ?",
+                [(tid,) for tid in removed],
+            )
+            cursor.executemany(
+                "UPDATE tasks SET project = ? WHERE id = ?",
+                [(project.id, tid) for tid in added],
+            )
+            changes: Counter = Counter()
+            for tid, old in before.items():
+                new = old._replace(project=project.id if tid in added else None)
+                changes.update(delta(old, new))
+            self._apply_rollup(cursor, changes)
 
-    def save_task(self, task: Task) -> None:
-        with self._connect() as conn:
-            cursor = conn.cursor()
+    @staticmethod
+    def _facts(cursor, task_ids) -> Dict[str, TaskFacts]:
+        ids = list(task_ids)
+        facts: Dict[str, TaskFacts] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
             cursor.execute(
+                f"SELECT id, {_FACT_COLUMNS} FROM tasks "
+                f"WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            facts.update((row[0], TaskFacts(*row[1:])) for row in cursor.fetchall())
+        return facts
+
+    @staticmethod
+    def _apply_rollup(cursor, changes) -> None:
+        cursor.executemany(
+            """
+            INSERT INTO daily_rollup (day, dimension, key, metric, count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (dimension, key, day, metric)
+            DO UPDATE SET count = count + excluded.count
+            """,
+            [key + (count,) for key, count in changes.items() if count],
+        )
+
+    def _rebuild_rollup(self, cursor) -> None:
+        cursor.execute("DELETE FROM daily_rollup")
+        totals: Counter = Counter()
+        for row in cursor.execute(f"SELECT {_FACT_COLUMNS} FROM tasks").fetchall():
+            totals.update(contributions(TaskFacts(*row)))
+        self._apply_rollup(cursor, totals)
+
+    @_retry_on_busy
+    def rebuild_rollup(self) -> None:
+        """Recompute daily_rollup from the tasks table."""
+        with self._connect() as conn:
+            self._rebuild_rollup(conn.cursor())
+
+    def rollup_rows(
+        self, dimension: str, key: str, since: date, until: date
+    ) -> List[Tuple[str, str, int]]:
+        """(day, metric, count) rollup rows for one dimension key and day range."""
+        with self._connect() as conn:
+            return conn.execute(
                 """
-                INSERT OR REPLACE INTO tasks
-                (id, title, status, due_date, project, tags)
-                VALUES (?, ?, ?, ?, ?, ?)
+                SELECT day, metric, count FROM daily_rollup
+                WHERE dimension = ? AND key = ? AND day BETWEEN ? AND ?
+                """,
+                (dimension, key, since.isoformat(), until.isoformat()),
+            ).fetchall()
+
+    def rollup_totals(
+        self,
+        dimension: str,
+        key: str,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+    ) -> Dict[str, int]:
+        """Per-metric sums over a day range (open-ended when a bound is None)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT metric, SUM(count) FROM daily_rollup
+                WHERE dimension = ? AND key = ? AND day >= ? AND day <= ?
+                GROUP BY metric
                 """,
                 (
-                    task.id,
-                    task.title,
-                    task.status,
-                    task.due.isoformat() if task.due else None,
-                    None,
-                    ",".join(task.tags),
+                    dimension,
+                    key,
+                    since.isoformat() if since else "",
+                    until.isoformat() if until else "9999-12-31",
                 ),
+            ).fetchall()
+        return {metric: total for metric, total in rows}
+
+    def _load_project(self, cursor, row) -> Project:
+        cursor.execute("SELECT id FROM tasks WHERE project = ?", (row[0],))
+        return Project(id=row[0], name=row[1], task_ids=[r[0] for r in cursor])
+
+    def get_project(self, project_id: str) -> Optional[Project]:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name FROM projects WHERE id = ?", (project_id,))
+            row = cursor.fetchone()
+            return self._load_project(cursor, row) if row else None
+
+    def find_project_by_name(self, name: str) -> Optional[Project]:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name FROM projects WHERE name = ?", (name,))
+            row = cursor.fetchone()
+            return self._load_project(cursor, row) if row else None
+
+    def find_project_id(self, name: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM projects WHERE name = ?", (name,)
+            ).fetchone()
+            return row[0] if row else None
+
+    @_retry_on_busy
+    def ensure_project(self, name: str, project_id: Optional[str] = None) -> str:
+        """Id of the project called name, creating it (as project_id) if needed.
+
+        Unlike find_project_by_name() plus save_project(), this never reads
+        the project's members, so its cost doesn't grow with the project.
+        """
+        found = self.find_project_id(name)
+        if found is not None:
+            return found
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO projects (id, name) VALUES (?, ?)",
+                (project_id or Project(name=name).id, name),
+            )
+            # another writer may have created it first
+            return conn.execute(
+                "SELECT id FROM projects WHERE name = ?", (name,)
+            ).fetchone()[0]
+
+    def find_project_by_task(self, task_id: str) -> Optional[Project]:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT p.id, p.name FROM tasks t JOIN projects p ON p.id = t.project "
+                "WHERE t.id = ?",
+                (task_id,),
+            )
+            row = cursor.fetchone()
+            return self._load_project(cursor, row) if row else None
+
+    @_retry_on_busy
+    def save_task(
+        self, task: Task, project_id: Optional[str] = None, *, recreate: bool = False
+    ) -> None:
+        """Insert or update a task, compare-and-swap on its version.
+
+        An update only applies if the row still has the version the task was
+        loaded with; otherwise ConcurrentModificationError is raised instead
+        of silently overwriting someone else's write. A saved task (version
+        > 0) whose row is gone was deleted meanwhile and is only inserted
+        again with recreate=True, e.g. to undo that delete. The reporting
+        rollup is adjusted in the same transaction. project_id, the project
+        a new task is about to join, is stored with the insert.
+        """
+        completed_at = task.completed_at.isoformat() if task.completed_at else None
+        values = (
+            task.title,
+            task.status,
+            task.due.isoformat() if task.due else None,
+            ",".join(task.tags),
+            task.description,
+            task.priority,
+            ",".join(task.deps),
+            completed_at,
+            task.recurrence,
+            task.series,
+            ",".join(task.skipped),
+        )
+        conflict = ConcurrentModificationError(
+            f"Task {task.id} changed since it was read"
+        )
+        with self._connect() as conn:
+            self._lock_for_write(conn)
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT version, {_FACT_COLUMNS} FROM tasks WHERE id = ?",
+                (task.id,),
+            )
+            row = cursor.fetchone()
+            old = TaskFacts(*row[1:]) if row else None
+            if row is None and task.version and not recreate:
+                raise conflict
+            if row is None:
+                cursor.execute(
+                    """
+                    INSERT INTO tasks
+                    (title, status, due_date, tags, description, priority, deps,
+                     completed_at, recurrence, series, skipped, project, id,
+                     created_at, version)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO NOTHING
+                    """,
+                    values
+                    + (
+                        project_id,
+                        task.id,
+                        task.created_at.isoformat(),
+                        task.version + 1,
+                    ),
+                )
+            elif row[0] == task.version:
+                # the project column is left alone so membership survives edits
+                cursor.execute(
+                    """
+                    UPDATE tasks SET
+                        title = ?, status = ?, due_date = ?, tags = ?,
+                        description = ?, priority = ?, deps = ?, completed_at = ?,
+                        recurrence = ?, series = ?, skipped = ?,
+                        created_at = COALESCE(created_at, ?),
+                        version = version + 1
+                    WHERE id = ? AND version = ?
+                    """,
+                    values + (task.created_at.isoformat(), task.id, task.version),
+                )
+            if row is not None and row[0] != task.version or cursor.rowcount == 0:
+                raise conflict
+            created_at = old.created_at if old else None
+            new = TaskFacts(
+                created_at or task.created_at.isoformat(),
+                completed_at,
+                task.status,
+                old.project if old else project_id,
+                ",".join(task.tags),
+                task.recurrence,
             )
+            self._apply_rollup(cursor, delta(old, new))
+        task.version += 1
 
     def get_task(self, task_id: str) -> Optional[Task]:
         with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT id, title, status, due_date, tags FROM tasks WHERE id = ?",
+                f"SELECT {_TASK_COLUMNS} FROM tasks WHERE id = ?",
                 (task_id,),
             )
             row = cursor.fetchone()
             if not row:
                 return None
-
-            return Task(
-                id=row[0],
-                title=row[1],
-                status=row[2],
-                due=datetime.fromisoformat(row[3]) if row[3] else None,
-                tags=row[4].split(",") if row[4] else [],
-            )
+            return _row_to_task(row)
 
     def list_tasks(self) -> List[Task]:
         with self._connect() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, title, status, due_date, tags FROM tasks")
-            rows = cursor.fetchall()
-
-            tasks = []
-            for row in rows:
-                tasks.append(
-                    Task(
-                        id=row[0],
-                        title=row[1],
-                        status=row[2],
-                        due=datetime.fromisoformat(row[3]) if row[3] else None,
-                        tags=row[4].split(",") if row[4] else [],
+            cursor.execute(f"SELECT {_TASK_COLUMNS} FROM tasks")
+            return [_row_to_task(row) for row in cursor.fetchall()]
+
+    def list_occurrences(self, template_id: str) -> List[Task]:
+        """The materialized occurrences of a recurring task."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            # occurrence ids are a primary-key range under the template's id
+            cursor.execute(
+                f"SELECT {_TASK_COLUMNS} FROM tasks "
+                "WHERE id BETWEEN ? AND ? AND series = ?",
+                (
+                    occurrence_id(template_id, date.min),
+                    occurrence_id(template_id, date.max),
+                    template_id,
+                ),
+            )
+            return [_row_to_task(row) for row in cursor.fetchall()]
+
+    def iter_tasks(
+        self,
+        fields: Sequence[str],
+        project_id: Optional[str] = None,
+        tag: Optional[str] = None,
+        due_before: Optional[datetime] = None,
+        overdue_on: Optional[datetime] = None,
+        sort: Sequence[Tuple[str, bool]] = DEFAULT_SORT,
+        limit: Optional[int] = None,
+        due_after: Optional[datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream filtered tasks as dicts holding only the requested fields.
+
+        Filtering, ordering, LIMIT and the column projection all happen in
+        SQL; rows are yielded straight off the cursor. sort is a list of
+        (key, descending) pairs from sorting.parse_sort(). overdue_on keeps
+        unfinished tasks due before that day.
+
+        With due_before, recurring tasks are listed as their occurrences due
+        between due_after (default: start of today) and due_before, merged
+        into the sorted rows; otherwise a series shows as its template row.
+        """
+        sort = list(sort)
+        where: List[str] = []
+        params: List[Any] = []
+        if project_id is not None:
+            where.append("t.project = ?")
+            params.append(project_id)
+        if tag is not None:
+            where.append("instr(',' || t.tags || ',', ?) > 0")
+            params.append(f",{tag},")
+        expand = due_before is not None
+        series_where, series_params = list(where), list(params)
+        if due_before is not None:
+            where.append("t.due_date <= ?")
+            params.append(due_before.isoformat())
+        if due_after is not None:
+            where.append("t.due_date >= ?")
+            params.append(due_after.isoformat())
+        if overdue_on is not None:
+            where.append("t.status != 'done' AND t.due_date < ?")
+            params.append(overdue_on.date().isoformat())
+        if expand or overdue_on is not None:
+            where.append("t.recurrence IS NULL")
+
+        fetched = list(fields)
+        if expand:
+            # the merge with expanded occurrences compares on the sort keys
+            for name in [key for key, _ in sort] + ["id", "due"]:
+                if name not in fetched:
+                    fetched.append(name)
+        sql = "SELECT " + ", ".join(TASK_FIELDS[f] for f in fetched) + " FROM tasks t"
+        if "project" in fetched:
+            sql += " LEFT JOIN projects p ON p.id = t.project"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        order = [
+            f"{SORT_COLUMNS[key]} {'DESC' if desc else 'ASC'} NULLS LAST"
+            for key, desc in sort
+        ]
+        sql += " ORDER BY " + ", ".join(order + ["t.id"])
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._connect() as conn:
+            rows: Iterator[Dict[str, Any]] = (
+                dict(zip(fetched, row)) for row in conn.execute(sql, params)
+            )
+            if due_before is not None:
+                since = due_after or datetime.combine(
+                    datetime.utcnow().date(), datetime.min.time()
+                )
+                until = due_before
+                if overdue_on is not None:
+                    # unsaved occurrences are open; overdue ones are due
+                    # before that day
+                    until = min(
+                        until,
+                        datetime.combine(overdue_on.date(), datetime.min.time())
+                        - timedelta(microseconds=1),
                     )
+                expanded = self._occurrence_rows(
+                    conn, fetched, series_where, series_params, since, until
                 )
-            return tasks
+                by_key = row_sort_key(sort)
+                expanded.sort(key=by_key)
+                rows = itertools.islice(heapq.merge(rows, expanded, key=by_key), limit)
+            for item in rows:
+                if "tags" in item:
+                    item["tags"] = item["tags"].split(",") if item["tags"] else []
+                yield {f: item[f] for f in fields} if expand else item
 
+    @staticmethod
+    def _occurrence_rows(
+        conn,
+        fetched: List[str],
+        where: List[str],
+        params: List[Any],
+        since: datetime,
+        until: datetime,
+    ) -> List[Dict[str, Any]]:
+        """Rows for the not-yet-materialized occurrences due in [since, until]."""
+        sql = (
+            "SELECT "
+            + ", ".join(TASK_FIELDS[f] for f in fetched)
+            + ", t.recurrence, t.skipped FROM tasks t"
+        )
+        if "project" in fetched:
+            sql += " LEFT JOIN projects p ON p.id = t.project"
+        sql += " WHERE " + " AND ".join(
+            where + ["t.recurrence IS NOT NULL", "t.due_date <= ?"]
+        )
+        templates = conn.execute(sql, params + [until.isoformat()]).fetchall()
+        result: List[Dict[str, Any]] = []
+        for *values, rule, skipped in templates:
+            template = dict(zip(fetched, values))
+            first = datetime.fromisoformat(template["due"])
+            skipped_days = set(skipped.split(","))
+            due_dates = [
+                due
+                for due in occurrences(parse_rule(rule), first, since, until)
+                if due.date().isoformat() not in skipped_days
+            ]
+            if not due_dates:
+                continue
+            # occurrence ids sort by date, so the materialized ones in the
+            # window are a primary-key range
+            materialized = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT id FROM tasks WHERE id BETWEEN ? AND ?",
+                    (
+                        occurrence_id(template["id"], due_dates[0].date()),
+                        occurrence_id(template["id"], due_dates[-1].date()),
+                    ),
+                )
+            }
+            for due in due_dates:
+                task_id = occurrence_id(template["id"], due.date())
+                if task_id not in materialized:
+                    result.append(
+                        dict(template, id=task_id, due=due.isoformat(), status="open")
+                    )
+        return result
+
+    def iter_projects(self, fields: Sequence[str]) -> Iterator[Dict[str, Any]]:
+        """Stream projects with their task counts as dicts of the given fields."""
+        sql = (
+            "SELECT "
+            + ", ".join(PROJECT_FIELDS[f] for f in fields)
+            + " FROM projects p"
+        )
+        if "tasks" in fields:
+            sql += " LEFT JOIN tasks t ON t.project = p.id GROUP BY p.id"
+        with self._connect() as conn:
+            for row in conn.execute(sql):
+                yield dict(zip(fields, row))
+
+    @_retry_on_busy
     def complete_task(self, task_id: str) -> None:
         with self._connect() as conn:
+            self._lock_for_write(conn)
             cursor = conn.cursor()
+            old = self._facts(cursor, [task_id]).get(task_id)
+            if old is None or old.status == "done":
+                return
+            completed_at = datetime.utcnow().isoformat()
             cursor.execute(
-                "UPDATE tasks SET status = 'done' WHERE id = ?",
-                (task_id,),
+                """
+                UPDATE tasks SET status = 'done', completed_at = ?,
+                    version = version + 1
+                WHERE id = ? AND status != 'done'
+                """,
+                (completed_at, task_id),
             )
+            if cursor.rowcount != 1:
+                return
+            new = old._replace(status="done", completed_at=completed_at)
+            self._apply_rollup(cursor, delta(old, new))
 
+    @_retry_on_busy
     def delete_project(self, project_id: str) -> None:
         with self._connect() as conn:
+            self._lock_for_write(conn)
             cursor = conn.cursor()
+            cursor.execute("SELECT id FROM tasks WHERE project = ?", (project_id,))
+            doomed = self._facts(cursor, [r[0] for r in cursor.fetchall()])
             cursor.execute("DELETE FROM tasks WHERE project = ?", (project_id,))
             cursor.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+            changes: Counter = Counter()
+            for old in doomed.values():
+                changes.update(delta(old, None))
+            self._apply_rollup(cursor, changes)
 
     def list_projects(self) -> List[Project]:
         with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, name FROM projects")
-            rows = cursor.fetchall()
-
-            projects = []
-            for row in rows:
-                cursor.execute("SELECT id FROM tasks WHERE project = ?", (row[0],))
-                task_ids = [r[0] for r in cursor.fetchall()]
-                projects.append(
-                    Project(
-                        id=row[0],
-                        name=row[1],
-                        task_ids=task_ids,
-                    )
-                )
-            return projects
+            projects = {row[0]: Project(id=row[0], name=row[1]) for row in cursor}
+            cursor.execute("SELECT id, project FROM tasks WHERE project IS NOT NULL")
+            for task_id, project_id in cursor:
+                if project_id in projects:
+                    projects[project_id].task_ids.append(task_id)
+            return list(projects.values())
 
+    @_retry_on_busy
     def delete_task(self, task_id: str) -> None:
         with self._connect() as conn:
+            self._lock_for_write(conn)
             cursor = conn.cursor()
+            old = self._facts(cursor, [task_id]).get(task_id)
             cursor.execute(
                 "DELETE FROM tasks WHERE id = ?",
                 (task_id,),
             )
+            if cursor.rowcount != 1:
+                return
+            self._apply_rollup(cursor, delta(old, None))
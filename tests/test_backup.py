@@ -0,0 +1,114 @@
+import gzip
+
+import pytest
+from click.testing import CliRunner
+from task_manager import backup, cli
+from task_manager.service import TaskManager
+from task_manager.storage import SQLiteStorage
+
+
+def _state(storage):
+    tasks = sorted((t.id, t.status, t.title) for t in storage.list_tasks())
+    projects = sorted((p.name, sorted(p.task_ids)) for p in storage.list_projects())
+    return tasks, projects, storage.rollup_totals("all", "")
+
+
+def test_full_backup_is_a_snapshot_while_writes_continue(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "live.db"))
+    mgr = TaskManager(storage)
+    for i in range(300):
+        mgr.create_task(f"task {i}", description="x" * 400, project_name="P")
+    before = _state(storage)
+
+    writes = []
+
+    def write_during_backup(remaining, total):
+        writes.append(mgr.create_task(f"late {len(writes)}"))
+
+    info = backup.backup(
+        storage.db_path, tmp_path / "full.db.gz", pages=5, progress=write_during_backup
+    )
+    assert len(writes) > 1 and info.kind == "full" and info.tasks == 300
+    with open(tmp_path / "full.db.gz", "rb") as f:
+        assert gzip.GzipFile(fileobj=f).read(16) == b"SQLite format 3\x00"
+
+    target = tmp_path / "restored.db"
+    backup.restore([tmp_path / "full.db.gz"], target)
+    assert _state(SQLiteStorage(str(target))) == before
+    with pytest.raises(backup.BackupError):
+        backup.restore([tmp_path / "full.db.gz"], target)
+
+
+def test_incremental_chain_restores_current_state(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "live.db"))
+    mgr = TaskManager(storage)
+    keep = mgr.create_task("keep", project_name="Home")
+    drop = mgr.create_task("drop", project_name="Home")
+    mgr.create_task("in doomed project", project_name="Old")
+    full = backup.backup(storage.db_path, tmp_path / "full.db")
+
+    mgr.mark_complete(keep.id)
+    mgr.delete_task(drop.id)
+    storage.delete_project(storage.find_project_by_name("Old").id)
+    added = mgr.create_task("new", tags=["t"], project_name="Home")
+    first = backup.backup(
+        storage.db_path, tmp_path / "inc1.db.gz", since=tmp_path / "full.db"
+    )
+    assert first.base_seq == full.seq and first.seq > full.seq
+
+    mgr.update_task(added.id, title="renamed")
+    backup.backup(storage.db_path, tmp_path / "inc2.db", since=tmp_path / "inc1.db.gz")
+
+    chain = [tmp_path / name for name in ("full.db", "inc1.db.gz", "inc2.db")]
+    target = tmp_path / "restored.db"
+    backup.restore(chain, target)
+    restored = SQLiteStorage(str(target))
+    assert _state(restored) == _state(storage)
+
+    # the restored database keeps the source's change sequence
+    later = backup.backup(target, tmp_path / "inc3.db", since=chain[-1])
+    assert later.seq == later.base_seq
+
+    with pytest.raises(backup.BackupError, match="does not follow"):
+        backup.restore([chain[0], chain[2]], tmp_path / "gap.db")
+    assert not (tmp_path / "gap.db").exists()
+
+
+def test_cli_backup_and_restore(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "c.db")))
+    cli.get_manager().create_task("one")
+    runner = CliRunner()
+
+    r = runner.invoke(cli.cli, ["backup", str(tmp_path / "b.db")])
+    assert r.exit_code == 0 and "Full backup" in r.output
+    r = runner.invoke(cli.cli, ["restore", str(tmp_path / "b.db")])
+    assert "Restore failed" in r.output and "exists" in r.output
+    r = runner.invoke(
+        cli.cli, ["restore", str(tmp_path / "b.db"), "--to", str(tmp_path / "r.db")]
+    )
+    assert r.exit_code == 0 and "1 tasks" in r.output
+
+
+def test_incremental_reads_gzipped_base_metadata_without_unpacking(
+    tmp_path, monkeypatch
+):
+    storage = SQLiteStorage(str(tmp_path / "live.db"))
+    TaskManager(storage).create_task("one")
+    full = backup.backup(storage.db_path, tmp_path / "full.db.gz")
+    TaskManager(storage).create_task("two")
+
+    def unpack(path):
+        raise AssertionError(f"unpacked {path}")
+
+    with monkeypatch.context() as m:
+        m.setattr(backup, "_opened", unpack)
+        assert backup.read_info(tmp_path / "full.db.gz") == full
+        inc = backup.backup(
+            storage.db_path, tmp_path / "inc.db", since=tmp_path / "full.db.gz"
+        )
+    assert inc.base_seq == full.seq
+    # still a gzip file any reader accepts
+    with gzip.open(tmp_path / "full.db.gz") as f:
+        assert f.read(16) == b"SQLite format 3\x00"
+    backup.restore([tmp_path / "full.db.gz", tmp_path / "inc.db"], tmp_path / "r.db")
+    assert len(SQLiteStorage(str(tmp_path / "r.db")).list_tasks()) == 2
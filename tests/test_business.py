@@ -1,6 +1,7 @@
 from task_manager.repository import InMemoryRepository
 from task_manager.service import TaskManager, BusinessError
 from task_manager.models import Task, Project
+from task_manager.storage import SQLiteStorage
 
 
 def test_dependencies_block_completion():
@@ -50,3 +51,45 @@ def test_delete_task_removes_from_project():
     assert proj2 is not None
     assert t.id not in proj2.task_ids
     assert repo.get_task(t.id) is None
+
+
+def test_dependencies_persist_in_sqlite(tmp_path):
+    mgr = TaskManager(SQLiteStorage(str(tmp_path / "deps.db")))
+    t1 = mgr.create_task("T1")
+    t2 = mgr.create_task("T2")
+    mgr.update_task(t2.id, deps=[t1.id])
+    assert mgr.can_complete(t2.id) == (False, [t1.id])
+    mgr.mark_complete(t1.id)
+    assert mgr.can_complete(t2.id) == (True, [])
+
+
+def test_project_created_concurrently_under_same_name(tmp_path):
+    a = SQLiteStorage(str(tmp_path / "p.db"))
+    b = SQLiteStorage(str(tmp_path / "p.db"))
+    first, second = Task(title="first"), Task(title="second")
+    a.save_task(first)
+    b.save_task(second)
+    a.save_project(Project(name="X", task_ids=[first.id]))
+    # b looked the name up before a created it
+    late = Project(name="X", task_ids=[second.id])
+    b.save_project(late)
+    stored = a.find_project_by_name("X")
+    assert late.id == stored.id
+    assert sorted(stored.task_ids) == sorted([first.id, second.id])
+
+
+def test_create_task_in_project_does_not_read_members(tmp_path, monkeypatch):
+    storage = SQLiteStorage(str(tmp_path / "p.db"))
+    mgr = TaskManager(storage)
+    first = mgr.create_task("first", project_name="Big")
+
+    def unexpected(*args):
+        raise AssertionError("membership round-trip")
+
+    monkeypatch.setattr(storage, "_load_project", unexpected)
+    monkeypatch.setattr(storage, "save_project", unexpected)
+    second = mgr.create_task("second", project_name="Big")
+    monkeypatch.undo()
+    assert sorted(storage.find_project_by_name("Big").task_ids) == sorted(
+        [first.id, second.id]
+    )
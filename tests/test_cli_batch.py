@@ -0,0 +1,70 @@
+from click.testing import CliRunner
+from task_manager import cli
+from task_manager.storage import SQLiteStorage
+
+
+def _script(tmp_path, lines):
+    path = tmp_path / "script.txt"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_run_batch_executes_all_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "b.db")))
+    script = _script(
+        tmp_path,
+        [
+            "# provisioning",
+            'create-task --title "First task" --priority 1',
+            "",
+            "create-task --title Second -t chores",
+            "create-project --name Ops",
+        ],
+    )
+    result = CliRunner().invoke(cli.cli, ["run-batch", script, "--batch-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert "3 commands, 0 failed, 2 batches committed" in result.output
+    titles = sorted(t.title for t in cli.storage.list_tasks())
+    assert titles == ["First task", "Second"]
+    assert cli.storage.find_project_by_name("Ops") is not None
+
+
+def test_run_batch_stop_on_error_rolls_back_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "b.db")))
+    script = _script(
+        tmp_path,
+        [
+            "create-task --title committed",
+            "create-task --title rolled-back",
+            "complete-task does-not-exist",
+            "create-task --title never-run",
+        ],
+    )
+    result = CliRunner().invoke(cli.cli, ["run-batch", script, "--batch-size", "1"])
+    assert result.exit_code == 1
+    titles = {t.title for t in cli.storage.list_tasks()}
+    assert titles == {"committed", "rolled-back"}
+
+    result = CliRunner().invoke(cli.cli, ["run-batch", script, "--batch-size", "10"])
+    assert result.exit_code == 1
+    assert "line 3:" in result.output
+    # the whole second run was a single batch, so nothing new was kept
+    assert len(cli.storage.list_tasks()) == 2
+
+
+def test_run_batch_continue_on_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "b.db")))
+    script = _script(
+        tmp_path,
+        [
+            "create-task --title one",
+            "no-such-command",
+            "create-task --priority notanint --title bad",
+            "create-task --title two",
+        ],
+    )
+    result = CliRunner().invoke(cli.cli, ["run-batch", script, "--continue-on-error"])
+    assert result.exit_code == 1
+    assert "4 commands, 2 failed" in result.output
+    assert "Unknown command 'no-such-command'" in result.output
+    assert {t.title for t in cli.storage.list_tasks()} == {"one", "two"}
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+from click.testing import CliRunner
+from task_manager import cli
+from task_manager.storage import SQLiteStorage
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "f.db")))
+    runner = CliRunner()
+    mgr = cli.get_manager()
+    mgr.create_task("Write docs", priority=2, tags=["docs"], project_name="Site")
+    mgr.create_task("Fix, bug", priority=1, tags=["bug", "urgent"])
+    return runner
+
+
+def test_list_tasks_jsonl_projects_fields(tmp_path, monkeypatch):
+    runner = _setup(tmp_path, monkeypatch)
+    r = runner.invoke(
+        cli.cli, ["list-tasks", "--format", "jsonl", "--fields", "title,priority,tags"]
+    )
+    assert r.exit_code == 0
+    rows = [json.loads(line) for line in r.output.splitlines()]
+    assert rows == [
+        {"title": "Fix, bug", "priority": 1, "tags": ["bug", "urgent"]},
+        {"title": "Write docs", "priority": 2, "tags": ["docs"]},
+    ]
+
+
+def test_list_tasks_csv_and_filters(tmp_path, monkeypatch):
+    runner = _setup(tmp_path, monkeypatch)
+    r = runner.invoke(
+        cli.cli, ["list-tasks", "--format", "csv", "--fields", "title,tags,project"]
+    )
+    rows = list(csv.reader(io.StringIO(r.output)))
+    assert rows == [
+        ["title", "tags", "project"],
+        ["Fix, bug", "bug,urgent", ""],
+        ["Write docs", "docs", "Site"],
+    ]
+    r = runner.invoke(
+        cli.cli,
+        ["list-tasks", "--project", "Site", "--format", "tsv", "--fields", "title"],
+    )
+    assert r.output == "title\nWrite docs\n"
+    r = runner.invoke(cli.cli, ["list-tasks", "--tag", "urgent", "--fields", "title"])
+    assert r.output == "Fix, bug\n"
+
+
+def test_list_tasks_rejects_unknown_field(tmp_path, monkeypatch):
+    runner = _setup(tmp_path, monkeypatch)
+    r = runner.invoke(cli.cli, ["list-tasks", "--fields", "title,owner"])
+    assert r.exit_code == 2
+    assert "owner" in r.output
+
+
+def test_list_projects_formats(tmp_path, monkeypatch):
+    runner = _setup(tmp_path, monkeypatch)
+    r = runner.invoke(cli.cli, ["list-projects"])
+    assert r.output.endswith(" | Site | tasks:1\n")
+    r = runner.invoke(
+        cli.cli, ["list-projects", "--format", "jsonl", "--fields", "name,tasks"]
+    )
+    assert json.loads(r.output) == {"name": "Site", "tasks": 1}
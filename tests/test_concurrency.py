@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+
+import pytest
+from task_manager.commands import UpdateTaskCommand
+from task_manager.models import Task
+from task_manager.repository import ConcurrentModificationError, InMemoryRepository
+from task_manager.service import BusinessError, TaskManager
+from task_manager.storage import SQLiteStorage
+
+
+def test_stale_update_is_rejected(tmp_path):
+    db = str(tmp_path / "c.db")
+    mgr_a = TaskManager(SQLiteStorage(db))
+    mgr_b = TaskManager(SQLiteStorage(db))
+    t = mgr_a.create_task("shared")
+
+    # both writers read version 1, b wins, a must not clobber b's write
+    stale = mgr_a.get_task(t.id)
+    mgr_b.update_task(t.id, title="from b")
+    stale.title = "from a"
+    with pytest.raises(ConcurrentModificationError):
+        mgr_a.repo.save_task(stale)
+
+    assert mgr_a.get_task(t.id).title == "from b"
+    assert mgr_a.get_task(t.id).version == 2
+
+
+def test_manager_surfaces_conflict_as_business_error(tmp_path, monkeypatch):
+    storage = SQLiteStorage(str(tmp_path / "c.db"))
+    mgr = TaskManager(storage)
+    t = mgr.create_task("race")
+    other = TaskManager(SQLiteStorage(str(tmp_path / "c.db")))
+
+    real_get = storage.get_task
+
+    def get_then_lose_race(task_id):
+        task = real_get(task_id)
+        other.update_task(task_id, priority=1)
+        return task
+
+    monkeypatch.setattr(storage, "get_task", get_then_lose_race)
+    with pytest.raises(BusinessError, match="modified concurrently"):
+        mgr.update_task(t.id, title="lost")
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "memory"])
+def test_update_racing_a_delete_does_not_resurrect(tmp_path, backend):
+    if backend == "sqlite":
+        repo = SQLiteStorage(str(tmp_path / "c.db"))
+    else:
+        repo = InMemoryRepository()
+    mgr = TaskManager(repo)
+    t = mgr.create_task("doomed")
+    stale = Task(**{**mgr.get_task(t.id).__dict__})
+    mgr.delete_task(t.id)
+    stale.title = "edited"
+    with pytest.raises(ConcurrentModificationError):
+        repo.save_task(stale)
+    assert repo.get_task(t.id) is None
+
+    # undo of the delete is the one way back
+    mgr.restore_task(stale)
+    assert repo.get_task(t.id).title == "edited"
+
+
+def test_in_memory_repository_checks_versions():
+    repo = InMemoryRepository()
+    t = TaskManager(repo).create_task("x")
+    copy = Task(**{**t.__dict__, "version": t.version - 1})
+    with pytest.raises(ConcurrentModificationError):
+        repo.save_task(copy)
+
+
+def test_busy_database_is_retried(tmp_path):
+    db = str(tmp_path / "c.db")
+    storage = SQLiteStorage(db, busy_timeout=0.01, busy_retries=1)
+    blocker = sqlite3.connect(db, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError):
+        storage.save_task(Task(title="gives up"))
+
+    # with enough retries the write lands once the other writer lets go
+    storage.busy_retries = 10
+    threading.Timer(0.1, blocker.rollback).start()
+    storage.save_task(Task(title="retried"))
+    assert [t.title for t in storage.list_tasks()] == ["retried"]
+
+
+def test_update_with_expected_version():
+    mgr = TaskManager(InMemoryRepository())
+    t = mgr.create_task("x")
+    seen = t.version
+    mgr.update_task(t.id, expected_version=seen, title="y")
+    with pytest.raises(BusinessError):
+        mgr.update_task(t.id, expected_version=seen, title="z")
+    assert mgr.get_task(t.id).title == "y"
+
+
+def test_update_command_does_not_pass_title_as_version():
+    mgr = TaskManager(InMemoryRepository())
+    t = mgr.create_task("before")
+    cmd = UpdateTaskCommand(mgr, t.id, "after")
+    cmd.execute()
+    assert mgr.get_task(t.id).title == "after"
+    cmd.undo()
+    assert mgr.get_task(t.id).title == "before"
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+from task_manager import cli, daemon
+from task_manager.storage import SQLiteStorage
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "d.db")))
+    monkeypatch.setattr(cli, "undo_manager", cli.UndoManager())
+    srv = daemon.TaskDaemon(str(tmp_path / "d.sock"), cli.cli)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    thread.join()
+
+
+def test_forward_without_daemon_runs_locally(tmp_path):
+    assert daemon.forward(["list-tasks"], str(tmp_path / "missing.sock")) is None
+
+
+def test_commands_run_in_daemon(server, capsys):
+    assert daemon.forward(["create-task", "--title", "remote"], server.socket_path) == 0
+    assert daemon.forward(["list-tasks"], server.socket_path) == 0
+    out = capsys.readouterr().out
+    assert "Task created" in out
+    assert "remote" in out
+    # undo history lives in the daemon, so it spans client invocations
+    assert daemon.forward(["undo"], server.socket_path) == 0
+    assert cli.storage.list_tasks() == []
+
+
+def test_failures_and_usage_errors_report_exit_codes(server, capsys):
+    assert daemon.forward(["create-task"], server.socket_path) == 2
+    assert "Missing option" in capsys.readouterr().err
+    assert daemon.forward(["run-batch", "-"], server.socket_path) is None
+
+
+def test_profiled_runs_stay_local(server, monkeypatch):
+    assert daemon.forward(["--profile", "list-tasks"], server.socket_path) is None
+    monkeypatch.setenv("TASK_MANAGER_PROFILE_OUT", "trace.json")
+    assert daemon.forward(["list-tasks"], server.socket_path) is None
+
+
+def test_concurrent_clients(server):
+    results = []
+
+    def client(i):
+        code = daemon.forward(["create-task", "--title", f"t{i}"], server.socket_path)
+        results.append(code)
+        results.append(daemon.forward(["list-tasks"], server.socket_path))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [0] * 16
+    assert len(cli.storage.list_tasks()) == 8
@@ -0,0 +1,64 @@
+import json
+import time
+
+from click.testing import CliRunner
+from task_manager import cli
+from task_manager.service import TaskManager
+from task_manager.storage import SQLiteStorage
+
+
+def test_profile_reports_layers_and_sql(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "p.db")))
+    original = TaskManager.create_task
+    runner = CliRunner(mix_stderr=False)
+
+    r = runner.invoke(cli.cli, ["--profile", "create-task", "--title", "x"])
+    assert r.exit_code == 0
+    assert "Task created" in r.stdout
+    for layer in (
+        "cli create-task",
+        "UndoManager.execute",
+        "TaskManager.create_task",
+        "SQLiteStorage.save_task",
+    ):
+        assert layer in r.stderr
+    assert "connections opened" in r.stderr
+    # instrumentation is removed again afterwards
+    assert TaskManager.create_task is original
+    assert SQLiteStorage.connection_factory.__name__ == "Connection"
+
+
+def test_profile_out_writes_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "p.db")))
+    cli.get_manager().create_task("y")
+    out = tmp_path / "trace.json"
+    runner = CliRunner(mix_stderr=False)
+    r = runner.invoke(cli.cli, ["--profile-out", str(out), "show-task", "nope"])
+    assert r.exit_code == 0
+    data = json.loads(out.read_text())
+    names = {span["name"] for span in data["spans"]}
+    assert {"cli show-task", "SQLiteStorage.get_task"} <= names
+    assert data["sql"]["statements"] == 1
+
+
+def test_profile_env_var(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "p.db")))
+    cli.get_manager().create_task("z")
+    runner = CliRunner(mix_stderr=False)
+    r = runner.invoke(cli.cli, ["list-tasks"], env={"TASK_MANAGER_PROFILE": "1"})
+    assert "SQLiteStorage.iter_tasks" in r.stderr
+    r = runner.invoke(cli.cli, ["list-tasks"])
+    assert r.stderr == ""
+
+
+def test_click_parsing_only_timed_for_this_invocation(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "p.db")))
+    runner = CliRunner(mix_stderr=False)
+    monkeypatch.setattr(cli, "_started_at", time.perf_counter())
+    r = runner.invoke(cli.cli, ["--profile", "list-tasks"])
+    assert "click parsing" in r.stderr
+    # e.g. a daemon started by main(): later requests don't inherit its start
+    monkeypatch.setattr(cli, "_started_at", time.perf_counter())
+    runner.invoke(cli.cli, ["list-tasks"])
+    r = runner.invoke(cli.cli, ["--profile", "list-tasks"])
+    assert "click parsing" not in r.stderr
@@ -0,0 +1,204 @@
+from datetime import date, datetime
+
+import pytest
+from click.testing import CliRunner
+from task_manager import cli
+from task_manager.recurrence import occurrence_dates, parse_rule
+from task_manager.service import BusinessError, TaskManager
+from task_manager.sharding import ShardedStorage
+from task_manager.storage import SQLiteStorage
+
+
+def _dates(rule, anchor, since, until):
+    found = occurrence_dates(parse_rule(rule), anchor, since, until)
+    return [d.isoformat() for d in found]
+
+
+def test_occurrence_dates():
+    jan31 = date(2024, 1, 31)
+    assert _dates("monthly", jan31, date(2024, 2, 1), date(2024, 4, 30)) == [
+        "2024-02-29",
+        "2024-03-31",
+        "2024-04-30",
+    ]
+    monday = date(2024, 1, 1)
+    assert _dates("every 3 days", monday, date(2024, 1, 5), date(2024, 1, 12)) == [
+        "2024-01-07",
+        "2024-01-10",
+    ]
+    assert _dates("every 2 weeks tue,fri", monday, monday, date(2024, 1, 19)) == [
+        "2024-01-02",
+        "2024-01-05",
+        "2024-01-16",
+        "2024-01-19",
+    ]
+    # a window decades after the anchor is reached without walking to it
+    assert _dates("weekdays", monday, date(2090, 6, 1), date(2090, 6, 4)) == [
+        "2090-06-01",
+        "2090-06-02",
+    ]
+    assert str(parse_rule("every 1 weeks")) == "weekly"
+    with pytest.raises(ValueError):
+        parse_rule("fortnightly")
+
+
+def _series(storage):
+    mgr = TaskManager(storage)
+    chore = mgr.create_task(
+        "water plants",
+        due=datetime(2024, 1, 1, 9),
+        tags=["home"],
+        project_name="House",
+        recurrence="daily",
+    )
+    mgr.create_task("one-off", due=datetime(2024, 3, 2, 12))
+    return mgr, chore
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_occurrences_expand_within_window(tmp_path, backend):
+    if backend == "sqlite":
+        storage = SQLiteStorage(str(tmp_path / "r.db"))
+    else:
+        storage = ShardedStorage(tmp_path / "shards", shards=3)
+    mgr, chore = _series(storage)
+
+    done = mgr.mark_complete(f"{chore.id}@2024-03-02")
+    assert done.series == chore.id and done.version == 1
+    with pytest.raises(BusinessError):
+        mgr.mark_complete(chore.id)
+    with pytest.raises(BusinessError):
+        mgr.get_task(f"{chore.id}@2023-12-31")  # before the series starts
+
+    rows = list(
+        storage.iter_tasks(
+            ["title", "due", "status", "project"],
+            due_after=datetime(2024, 3, 1),
+            due_before=datetime(2024, 3, 3, 23),
+            sort=[("due", False)],
+        )
+    )
+    assert [(r["title"], r["due"], r["status"]) for r in rows] == [
+        ("water plants", "2024-03-01T09:00:00", "open"),
+        ("water plants", "2024-03-02T09:00:00", "done"),
+        ("one-off", "2024-03-02T12:00:00", "open"),
+        ("water plants", "2024-03-03T09:00:00", "open"),
+    ]
+    assert {r["project"] for r in rows if r["title"] == "water plants"} == {"House"}
+    # only the template and the completed occurrence are stored
+    assert len(storage.list_tasks()) == 3
+
+    limited = storage.iter_tasks(
+        ["id"],
+        due_after=datetime(2024, 3, 1),
+        due_before=datetime(2024, 12, 31),
+        sort=[("due", False)],
+        limit=2,
+    )
+    assert [r["id"] for r in limited] == [
+        f"{chore.id}@2024-03-01",
+        f"{chore.id}@2024-03-02",
+    ]
+
+
+def test_cli_repeat_and_show_occurrence(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "c.db")))
+    runner = CliRunner()
+    r = runner.invoke(
+        cli.cli,
+        [
+            "create-task",
+            "--title",
+            "standup",
+            "--due",
+            "2024-05-06T10:00",
+            "--repeat",
+            "weekdays",
+        ],
+    )
+    assert r.exit_code == 0
+    template = cli.storage.list_tasks()[0]
+    assert template.recurrence == "mon,tue,wed,thu,fri"
+
+    r = runner.invoke(
+        cli.cli,
+        [
+            "list-tasks",
+            "--due-after",
+            "2024-05-10",
+            "--due-before",
+            "2024-05-14",
+            "--format",
+            "csv",
+            "--fields",
+            "id,due",
+        ],
+    )
+    assert r.output.splitlines()[1:] == [
+        f"{template.id}@2024-05-10,2024-05-10T10:00:00",
+        f"{template.id}@2024-05-13,2024-05-13T10:00:00",
+    ]
+
+    r = runner.invoke(
+        cli.cli,
+        ["list-tasks", "--due-after", "2024-05-13", "--due-before", "2024-05-13T23:00"],
+    )
+    assert r.output.startswith(f"{template.id[:8]}@2024-05-13 | standup")
+
+    r = runner.invoke(cli.cli, ["show-task", f"{template.id}@2024-05-13"])
+    assert '"series": "' + template.id in r.output
+    r = runner.invoke(cli.cli, ["create-task", "--title", "x", "--repeat", "daily"])
+    assert "needs a due date" in r.output
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_deleting_occurrences_and_series(tmp_path, backend, monkeypatch):
+    if backend == "sqlite":
+        storage = SQLiteStorage(str(tmp_path / "r.db"))
+    else:
+        storage = ShardedStorage(tmp_path / "shards", shards=3, partition="project")
+    mgr, chore = _series(storage)
+
+    def listed():
+        rows = storage.iter_tasks(
+            ["id"],
+            due_after=datetime(2024, 3, 1),
+            due_before=datetime(2024, 3, 3, 23),
+            sort=[("due", False)],
+        )
+        return [r["id"] for r in rows if r["id"].startswith(chore.id)]
+
+    # materializing looks the series' project up directly
+    monkeypatch.setattr(storage, "list_projects", None)
+    done = mgr.mark_complete(f"{chore.id}@2024-03-02")
+    monkeypatch.undo()
+    assert done.id in storage.find_project_by_name("House").task_ids
+
+    mgr.delete_task(f"{chore.id}@2024-03-01")  # never materialized
+    mgr.delete_task(done.id)
+    assert listed() == [f"{chore.id}@2024-03-03"]
+    with pytest.raises(BusinessError):
+        mgr.get_task(f"{chore.id}@2024-03-01")
+    assert sorted(mgr.get_task(chore.id).skipped) == ["2024-03-01", "2024-03-02"]
+
+    mgr.update_task(f"{chore.id}@2024-03-03", title="water all plants")
+    mgr.delete_task(chore.id)
+    assert [t.title for t in storage.list_tasks()] == ["one-off"]
+    assert storage.find_project_by_name("House").task_ids == []
+
+
+def test_overdue_window_only_expands_past_occurrences(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "r.db"))
+    mgr, chore = _series(storage)
+    mgr.mark_complete(f"{chore.id}@2024-03-02")
+    rows = storage.iter_tasks(
+        ["id", "status"],
+        due_after=datetime(2024, 3, 1),
+        due_before=datetime(2024, 3, 6),
+        overdue_on=datetime(2024, 3, 3, 15),
+        sort=[("due", False)],
+    )
+    assert [(r["id"].startswith(chore.id), r["status"]) for r in rows] == [
+        (True, "open"),  # 03-01; 03-02 is done, 03-03 onwards not overdue
+        (False, "open"),
+    ]
@@ -0,0 +1,173 @@
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+from click.testing import CliRunner
+from task_manager import cli, reporting
+from task_manager.models import Task
+from task_manager.service import TaskManager
+from task_manager.sharding import ShardedStorage
+from task_manager.storage import SQLiteStorage
+
+
+def _rollup(storage):
+    with storage._connect() as conn:
+        return sorted(
+            conn.execute("SELECT * FROM daily_rollup WHERE count != 0").fetchall()
+        )
+
+
+def test_incremental_rollup_matches_rebuild(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "r.db"))
+    mgr = TaskManager(storage)
+    a = mgr.create_task("a", tags=["x"], project_name="P")
+    b = mgr.create_task("b", tags=["x", "y"], project_name="P")
+    c = mgr.create_task("c", project_name="Q")
+    mgr.mark_complete(a.id)
+    mgr.update_task(b.id, tags=["y"], status="done")
+    mgr.update_task(b.id, status="open")
+    storage.complete_task(c.id)
+    mgr.delete_task(a.id)
+    q = storage.find_project_by_name("Q")
+    storage.delete_project(q.id)
+
+    incremental = _rollup(storage)
+    storage.rebuild_rollup()
+    assert incremental == _rollup(storage)
+    totals = storage.rollup_totals("all", "")
+    assert totals == {"created": 1}
+    assert storage.rollup_totals("tag", "y") == {"created": 1}
+
+
+def test_existing_database_is_backfilled(tmp_path):
+    path = str(tmp_path / "old.db")
+    storage = SQLiteStorage(path)
+    task = Task(title="old", created_at=datetime(2024, 3, 1, 9))
+    task.completed_at = datetime(2024, 3, 2, 8)
+    task.status = "done"
+    storage.save_task(task)
+    with storage._connect() as conn:
+        conn.execute("DROP TABLE daily_rollup")
+
+    reopened = SQLiteStorage(path)
+    assert reopened.rollup_totals("all", "") == {
+        "created": 1,
+        "completed": 1,
+        "lead_le_24h": 1,
+    }
+
+
+def test_lead_time_percentiles():
+    totals = {"lead_le_1h": 5, "lead_le_24h": 4, reporting.LEAD_OVERFLOW: 1}
+    assert reporting.lead_time(totals) == {
+        "completed": 10,
+        "p50_hours": 1.0,
+        "p90_hours": 24.0,
+        "p99_hours": ">8760",
+    }
+    assert reporting.lead_time({})["p50_hours"] is None
+
+
+def test_report_cli(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "c.db")))
+    mgr = cli.get_manager()
+    done = mgr.create_task("done", tags=["ops"])
+    mgr.create_task("open", tags=["ops"], project_name="Site")
+    mgr.mark_complete(done.id)
+    today = datetime.utcnow().date()
+    runner = CliRunner()
+
+    r = runner.invoke(
+        cli.cli, ["report", "burndown", "--since", str(today - timedelta(days=1))]
+    )
+    assert r.exit_code == 0
+    assert r.output.splitlines() == [
+        f"{today - timedelta(days=1)} | created:0 | completed:0 | open:0",
+        f"{today} | created:2 | completed:1 | open:1",
+    ]
+
+    r = runner.invoke(
+        cli.cli, ["report", "throughput", "--project", "Site", "--format", "jsonl"]
+    )
+    rows = [json.loads(line) for line in r.output.splitlines()]
+    assert len(rows) == 30
+    assert rows[-1] == {"day": str(today), "created": 1, "completed": 0}
+
+    r = runner.invoke(
+        cli.cli, ["report", "lead-time", "--tag", "ops", "--format", "csv"]
+    )
+    assert r.output.splitlines() == [
+        "completed,p50_hours,p90_hours,p99_hours",
+        "1,1.0,1.0,1.0",
+    ]
+
+    r = runner.invoke(cli.cli, ["report", "throughput", "--tag", "a", "--status", "b"])
+    assert "at most one" in r.output
+
+
+def test_sharded_rollups_sum_across_shards(tmp_path):
+    single = SQLiteStorage(str(tmp_path / "single.db"))
+    sharded = ShardedStorage(tmp_path / "shards", shards=3, partition="project")
+    for storage in (single, sharded):
+        mgr = TaskManager(storage)
+        for i in range(12):
+            t = mgr.create_task(f"t{i}", tags=["even"] if i % 2 else [])
+            if i % 3 == 0:
+                mgr.mark_complete(t.id)
+        mgr.create_task("late", project_name="P")
+    today = date.today()
+    since = today - timedelta(days=2)
+    for dimension, key in (("all", ""), ("tag", "even"), ("status", "done")):
+        assert sorted(sharded.rollup_rows(dimension, key, since, today)) == sorted(
+            single.rollup_rows(dimension, key, since, today)
+        )
+        assert sharded.rollup_totals(dimension, key) == single.rollup_totals(
+            dimension, key
+        )
+
+
+def test_concurrent_writers_apply_each_delta_once(tmp_path):
+    path = str(tmp_path / "race.db")
+    mgr = TaskManager(SQLiteStorage(path))
+    ids = [mgr.create_task(f"t{i}").id for i in range(10)]
+    clients = [SQLiteStorage(path) for _ in range(4)]
+
+    def race(method):
+        for task_id in ids:
+            barrier = threading.Barrier(len(clients))
+
+            def run(storage):
+                barrier.wait()
+                getattr(storage, method)(task_id)
+
+            threads = [threading.Thread(target=run, args=(s,)) for s in clients]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+    race("complete_task")
+    race("delete_task")
+    storage = clients[0]
+    incremental = _rollup(storage)
+    storage.rebuild_rollup()
+    assert incremental == _rollup(storage)
+
+
+def test_lead_time_overflow_is_valid_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "c.db")))
+    now = datetime.utcnow()
+    task = Task(title="ancient", created_at=now - timedelta(days=400))
+    task.status, task.completed_at = "done", now
+    cli.storage.save_task(task)
+    runner = CliRunner()
+
+    r = runner.invoke(cli.cli, ["report", "lead-time", "--format", "jsonl"])
+    assert json.loads(r.output) == {
+        "completed": 1,
+        "p50_hours": ">8760",
+        "p90_hours": ">8760",
+        "p99_hours": ">8760",
+    }
+    r = runner.invoke(cli.cli, ["report", "lead-time"])
+    assert "p99:>8760h" in r.output
@@ -0,0 +1,145 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from click.testing import CliRunner
+from task_manager import cli, sharding
+from task_manager.models import Project
+from task_manager.service import TaskManager
+from task_manager.sharding import ShardedStorage, _bucket
+from task_manager.storage import SQLiteStorage
+
+
+def _populate(storage):
+    mgr = TaskManager(storage)
+    start = datetime(2024, 1, 1)
+    for i in range(40):
+        mgr.create_task(
+            f"task {i:02d}",
+            priority=1 + i % 5,
+            due=start + timedelta(days=i % 9),
+            tags=["even"] if i % 2 == 0 else [],
+            project_name=f"P{i % 3}",
+        )
+    return mgr
+
+
+@pytest.mark.parametrize("partition", ["hash", "project"])
+def test_sharded_matches_single_file(tmp_path, partition):
+    single = SQLiteStorage(str(tmp_path / "single.db"))
+    sharded = ShardedStorage(tmp_path / "shards", shards=4, partition=partition)
+    _populate(single)
+    mgr = _populate(sharded)
+
+    fields = ["title", "priority", "due", "project"]
+    sort = [("priority", True), ("due", False), ("title", False)]
+    expected = list(single.iter_tasks(fields, sort=sort))
+    assert list(sharded.iter_tasks(fields, sort=sort)) == expected
+    assert list(sharded.iter_tasks(fields, sort=sort, limit=7)) == expected[:7]
+    assert list(sharded.iter_tasks(["title"], tag="even", sort=sort)) == list(
+        single.iter_tasks(["title"], tag="even", sort=sort)
+    )
+
+    p1 = sharded.find_project_by_name("P1")
+    assert len(p1.task_ids) == len(single.find_project_by_name("P1").task_ids)
+    counts = {r["name"]: r["tasks"] for r in sharded.iter_projects(["name", "tasks"])}
+    assert counts == {"P0": 14, "P1": 13, "P2": 13}
+
+    # point operations still work after routing/moves
+    task_id = p1.task_ids[0]
+    mgr.update_task(task_id, title="renamed")
+    assert sharded.get_task(task_id).title == "renamed"
+    mgr.delete_task(task_id)
+    assert sharded.get_task(task_id) is None
+    assert len(sharded.list_tasks()) == 39
+
+
+def test_project_partition_colocates_tasks(tmp_path):
+    sharded = ShardedStorage(tmp_path / "shards", shards=4, partition="project")
+    _populate(sharded)
+    for project in sharded.list_projects():
+        # the project row and its tasks only exist on the project's shard
+        holders = [
+            i
+            for i, shard in enumerate(sharded.shards)
+            if shard.find_project_by_name(project.name) is not None
+        ]
+        assert len(holders) == 1
+        assert len(sharded.shards[holders[0]].list_tasks()) >= len(project.task_ids)
+
+
+def test_project_writes_skip_unrelated_shards(tmp_path):
+    sharded = ShardedStorage(
+        tmp_path / "shards", shards=2, partition="project", busy_timeout=0.05
+    )
+    mgr = TaskManager(sharded)
+    first = mgr.create_task("first", project_name="P")
+    home = sharded._locate(first.id)
+    assert home == _bucket(sharded.find_project_by_name("P").id, 2)
+    # a writer holding the other shard's lock doesn't stall this project
+    with sharded.shards[1 - home].transaction():
+        with sharded.shards[1 - home]._connect() as conn:
+            conn.execute("UPDATE tasks SET title = title")
+        for i in range(13):
+            mgr.create_task(f"t{i}", project_name="P")
+    assert len(sharded.find_project_by_name("P").task_ids) == 14
+    assert sharded.shards[1 - home].list_projects() == []
+
+
+def test_project_partition_notices_moves_by_other_processes(tmp_path):
+    a = ShardedStorage(tmp_path / "shards", shards=4, partition="project")
+    b = ShardedStorage(tmp_path / "shards", shards=4, partition="project")
+    tasks = [TaskManager(a).create_task(f"t{i}") for i in range(8)]
+    for t in tasks:
+        assert a.get_task(t.id) is not None  # a now caches every location
+    b.save_project(Project(name="P", task_ids=[t.id for t in tasks]))
+    assert len({b._locate(t.id) for t in tasks}) == 1
+    for t in tasks[1:]:
+        assert a.get_task(t.id).title == t.title
+    a.delete_task(tasks[0].id)  # stale cache entry, still deletes the moved row
+    assert b.get_task(tasks[0].id) is None
+    assert len(b.find_project_by_name("P").task_ids) == 7
+
+
+def test_cli_on_sharded_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", ShardedStorage(tmp_path / "shards", shards=3))
+    runner = CliRunner()
+    script = tmp_path / "script.txt"
+    script.write_text(
+        "\n".join(f"create-task --title t{i} --project Ops" for i in range(6)) + "\n"
+    )
+    assert runner.invoke(cli.cli, ["run-batch", str(script)]).exit_code == 0
+    r = runner.invoke(cli.cli, ["list-tasks", "--fields", "title", "--sort", "title"])
+    assert r.output.split() == [f"t{i}" for i in range(6)]
+    r = runner.invoke(cli.cli, ["list-projects", "--fields", "name,tasks"])
+    assert r.output == "Ops | tasks:6\n"
+
+
+def test_sharded_listing_streams_without_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, "STREAM_BATCH", 5)
+    monkeypatch.setattr(sharding, "STREAM_DEPTH", 2)
+    sharded = ShardedStorage(tmp_path / "shards", shards=4)
+    mgr = TaskManager(sharded)
+    for i in range(200):
+        mgr.create_task(f"t{i:03d}")
+    pulled = []
+    for shard in sharded.shards:
+        real = shard.iter_tasks
+
+        def counting(*args, real=real, **kwargs):
+            for row in real(*args, **kwargs):
+                pulled.append(row)
+                yield row
+
+        monkeypatch.setattr(shard, "iter_tasks", counting)
+
+    rows = sharded.iter_tasks(["title"], sort=[("title", False)])
+    assert next(rows)["title"] == "t000"
+    time.sleep(0.2)  # let the producers fill their buffers
+    # each shard reads at most its buffer, one batch in hand and one pending
+    assert len(pulled) <= 4 * 5 * (2 + 2) < 200
+    rows.close()
+    time.sleep(0.2)
+    assert not [t for t in threading.enumerate() if t.name == "shard-stream"]
+    assert len(list(sharded.iter_tasks(["title"]))) == 200
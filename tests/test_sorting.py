@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+from click.testing import CliRunner
+from task_manager import cli
+from task_manager.repository import InMemoryRepository
+from task_manager.service import TaskManager
+from task_manager.sorting import parse_sort, top_k
+from task_manager.storage import SQLiteStorage
+
+
+def test_parse_sort():
+    assert parse_sort(["priority,due:desc", "title:asc"]) == [
+        ("priority", False),
+        ("due", True),
+        ("title", False),
+    ]
+    with pytest.raises(ValueError):
+        parse_sort(["owner"])
+    with pytest.raises(ValueError):
+        parse_sort(["due:sideways"])
+
+
+def test_top_k_matches_full_sort():
+    repo = InMemoryRepository()
+    mgr = TaskManager(repo)
+    now = datetime(2024, 1, 1)
+    for i in range(50):
+        due = None if i % 7 == 0 else now + timedelta(days=(i * 13) % 17)
+        mgr.create_task(f"t{i:02d}", priority=1 + i % 5, due=due)
+    sort = [("priority", True), ("due", False)]
+    full = top_k(repo.list_tasks(), sort, None)
+    assert top_k(repo.list_tasks(), sort, 10) == full[:10]
+    assert mgr.list_tasks(sort=sort, limit=10) == full[:10]
+    # highest priority number first, tasks without due date last in each group
+    assert [t.priority for t in full[:10]] == [5] * 10
+    fives = [t for t in full if t.priority == 5]
+    assert fives[-1].due is None
+    assert all(a.due <= b.due for a, b in zip(fives, fives[1:]) if b.due)
+
+
+def test_cli_sort_and_limit_in_sql(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "storage", SQLiteStorage(str(tmp_path / "s.db")))
+    mgr = cli.get_manager()
+    mgr.create_task("b", priority=2, due=datetime(2024, 3, 1))
+    mgr.create_task("a", priority=2, due=datetime(2024, 1, 1))
+    mgr.create_task("c", priority=5)
+    mgr.create_task("d", priority=1, due=datetime(2024, 2, 1))
+    runner = CliRunner()
+
+    r = runner.invoke(cli.cli, ["list-tasks", "--fields", "title", "--sort", "due"])
+    assert r.output.split() == ["a", "d", "b", "c"]
+    r = runner.invoke(
+        cli.cli,
+        [
+            "list-tasks",
+            "--fields",
+            "title",
+            "--sort",
+            "priority:desc,title",
+            "--limit",
+            "2",
+        ],
+    )
+    assert r.output.split() == ["c", "a"]
+    r = runner.invoke(cli.cli, ["list-tasks", "--sort", "owner"])
+    assert r.exit_code == 2